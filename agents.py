@@ -1,5 +1,8 @@
-from crewai import Agent, Task, Crew, Process
-from tools import CarbonCalculatorTool, PortCongestionTool, RouteCompareTool, LogisticsTools
+import time
+from crewai import Agent, Task, Crew, Process, BaseLLM
+from tools import CarbonCalculatorTool, PortCongestionTool, RouteCompareTool
+from decision_table import get_decision
+from model_router import choose_tier, tier_model, template_narration, tier_metrics
 
 # Initialize tool instances
 carbon_calc = CarbonCalculatorTool()
@@ -42,6 +45,68 @@ risk_agent = Agent(
     allow_delegation=False
 )
 
+# Variants of the crew without tools (compact mode) and/or pinned to a model tier,
+# keyed by model name; LLM objects are never cached (see _crew_agents)
+_agent_variants = {}
+
+def _build_agents(compact, llm):
+    return [
+        Agent(
+            role=agent.role,
+            goal=agent.goal,
+            backstory=agent.backstory,
+            tools=[] if compact else agent.tools,
+            llm=llm,
+            verbose=True,
+            allow_delegation=False
+        )
+        for agent in (carbon_agent, cost_agent, risk_agent)
+    ]
+
+def _crew_agents(compact=False, llm=None):
+    """
+    Fresh copies of the three agents for one run, tool-less when the data is already
+    in the task, on the given LLM. Agents hold their executor while running, so
+    concurrent crews (Streamlit sessions run in threads) must not share instances.
+    """
+    if not compact and llm is None:
+        templates = [carbon_agent, cost_agent, risk_agent]
+    elif llm is None or isinstance(llm, str):
+        key = (compact, llm)
+        if key not in _agent_variants:
+            _agent_variants[key] = _build_agents(compact, llm)
+        templates = _agent_variants[key]
+    else:
+        # Caller-owned LLM object: build this run's agents directly rather than caching
+        # them against an object whose lifetime (and id) the cache can't track
+        templates = _build_agents(compact, llm)
+    
+    agents = [agent.copy() for agent in templates]
+    for agent in agents:
+        if isinstance(agent.llm, BaseLLM):
+            # copy() shallow-copies the LLM, so every copy shares the template's cumulative
+            # usage counters; start each run's from zero so token_usage is per run
+            agent.llm._token_usage = {key: 0 for key in agent.llm._token_usage}
+    return agents
+
+def format_compact_context(route_data, origin_congestion, dest_congestion):
+    """
+    Render route comparison and port congestion as pipe-delimited tables.
+    Far fewer tokens than the tools' dict output, and no tool round-trip to fetch it.
+    """
+    lines = ["mode|km|tCO2|base_usd|tax_usd|total_usd|days"]
+    for r in route_data:
+        lines.append(
+            f"{r['mode']}|{r['distance_km']:.0f}|{r['emissions_tonnes']}|{r['base_cost_usd']:.0f}"
+            f"|{r['carbon_tax_usd']:.0f}|{r['total_cost_usd']:.0f}|{r['transit_days']}"
+        )
+    lines.append("port|congestion/10|status|delay_days|berth")
+    for p in (origin_congestion, dest_congestion):
+        lines.append(
+            f"{p['port']}|{p['congestion_level']}|{p['status']}|{p['estimated_delay_days']}|{p['berth_availability']}"
+        )
+    return "\n".join(lines)
+
 def calculate_trilemma_score(route, weights={'cost': 0.33, 'carbon': 0.33, 'time': 0.34}):
     """
     Calculate trilemma optimization score for a route.
@@ -124,73 +189,156 @@ def select_optimal_route(route_data, origin_congestion, dest_congestion, weights
         'all_scores': {r['mode']: r['trilemma_score'] for r in route_data}
     }
 
-def initiate_swarm(origin, dest, weight, trilemma_weights=None):
-    """
-    Orchestrate multi-agent deliberation for optimal routing.
+def _run_crew(origin, dest, weight, carbon_tax_rate, route_data, origin_congestion, dest_congestion, compact, llm=None):
+    """Build the three deliberation tasks and run the crew."""
+    agents = _crew_agents(compact, llm)
     
-    Returns:
-        Dictionary containing route analysis and agent recommendations
-    """
+    if compact:
+        context = format_compact_context(route_data, origin_congestion, dest_congestion)
+        route_source = f"Precomputed route comparison and port congestion (do not call tools):\n{context}\n"
+        compare_step = route_source + "Compare standard sea freight, slow-steaming sea freight, and rail from the table."
+        cost_step = route_source + "Compare total costs (base + carbon tax) and transit times across all modes from the table."
+        risk_step = route_source + f"Use the congestion rows for {origin} and {dest}."
+    else:
+        compare_step = f"Use the Route Comparer tool (carbon_tax_rate={carbon_tax_rate}) to compare these modes: standard sea freight, slow-steaming sea freight, and rail."
+        cost_step = f"Use the Route Comparer tool (carbon_tax_rate={carbon_tax_rate}) to compare total costs (base + carbon tax) and transit times across all modes."
+        risk_step = f"Use the Port Congestion Checker to check congestion levels at {origin} and {dest}."
     
     # Task 1: Carbon Analysis
     carbon_task = Task(
         description=f"""Analyze carbon emissions for shipping {weight} tonnes from {origin} to {dest}.
         
-        Use the Route Comparer tool to compare these modes: standard sea freight, slow-steaming sea freight, and rail.
-        Calculate total emissions and carbon tax impact ($100/tonne CO2).
+        {compare_step}
+        Calculate total emissions and carbon tax impact (${carbon_tax_rate}/tonne CO2).
         
         Recommend the GREENEST option and explain the environmental benefits.""",
         expected_output="Detailed carbon analysis with mode comparison and green recommendation",
-        agent=carbon_agent
+        agent=agents[0]
     )
     
     # Task 2: Cost & Speed Analysis
     cost_task = Task(
         description=f"""Analyze cost and delivery time for shipping {weight} tonnes from {origin} to {dest}.
         
-        Use the Route Comparer tool to compare total costs (base + carbon tax) and transit times across all modes.
+        {cost_step}
         Factor in that faster delivery = better cash flow and customer satisfaction.
         
         Recommend the MOST COST-EFFECTIVE option balancing speed and total cost.""",
         expected_output="Cost-speed analysis with business-optimal recommendation",
-        agent=cost_agent
+        agent=agents[1]
     )
     
     # Task 3: Risk Assessment
     risk_task = Task(
         description=f"""Assess risks for shipping from {origin} to {dest}.
         
-        Use the Port Congestion Checker to check congestion levels at {origin} and {dest}.
+        {risk_step}
         Identify potential delays, reliability issues, and alternative routing needs.
         
         Provide a RISK RATING and mitigation strategy.""",
         expected_output="Risk assessment with congestion data and mitigation recommendations",
-        agent=risk_agent
+        agent=agents[2]
     )
     
     # Create the crew
     crew = Crew(
-        agents=[carbon_agent, cost_agent, risk_agent],
+        agents=agents,
         tasks=[carbon_task, cost_task, risk_task],
         process=Process.sequential,
         verbose=True
     )
     
-    # Execute and return results
-    result = crew.kickoff()
+    return crew.kickoff()
+
+def initiate_swarm(origin, dest, weight, trilemma_weights=None, carbon_tax_rate=100, compact=False, routing=False, llm=None):
+    """
+    Orchestrate multi-agent deliberation for optimal routing.
+    
+    With compact=True the route comparison and congestion data are computed up front
+    and injected into each task as a table, so agents answer without tool calls.
+    With routing=True clear-cut decisions are narrated from a template or handled by
+    the fast model, and only close calls or congested routes use the full model.
+    llm, if given, runs every agent on that model instead of the tier's.
+    
+    Returns:
+        Dictionary containing route analysis, agent recommendations and run metrics
+    """
+    
+    # Structured data for dashboard (and for the agents in compact mode),
+    # served from the precomputed decision table when the request is a standard one
+    analysis, decision_source = get_decision(origin, dest, weight, carbon_tax_rate, trilemma_weights)
+    route_data = analysis['route_comparison']
+    origin_congestion = analysis['origin_port_status']
+    dest_congestion = analysis['dest_port_status']
+    optimal_decision = analysis['optimal_decision']
+    
+    # Pick a model tier from the score spread and congestion risk before kickoff
+    tier, spread = None, None
+    if routing:
+        tier, spread = choose_tier(optimal_decision, origin_congestion, dest_congestion)
     
-    # Also return structured data for dashboard
-    route_data = LogisticsTools.compare_routes(origin, dest, weight)
-    origin_congestion = LogisticsTools.get_port_congestion(origin)
-    dest_congestion = LogisticsTools.get_port_congestion(dest)
+    # Execute and measure token spend / LLM round-trips
+    started = time.perf_counter()
+    if tier == 'template':
+        agent_output = template_narration(
+            origin, dest, weight, route_data, origin_congestion, dest_congestion, optimal_decision
+        )
+        total_tokens = prompt_tokens = completion_tokens = round_trips = 0
+    else:
+        result = _run_crew(
+            origin, dest, weight, carbon_tax_rate, route_data, origin_congestion, dest_congestion,
+            compact, llm=llm if llm is not None else tier_model(tier)
+        )
+        agent_output = str(result)
+        usage = result.token_usage
+        total_tokens = usage.total_tokens
+        prompt_tokens = usage.prompt_tokens
+        completion_tokens = usage.completion_tokens
+        round_trips = usage.successful_requests
+    latency = time.perf_counter() - started
     
-    # AI-driven route selection
-    optimal_decision = select_optimal_route(route_data, origin_congestion, dest_congestion, trilemma_weights)
+    if tier is not None:
+        tier_metrics.record(tier, latency, total_tokens)
     
     return {
-        'agent_output': str(result),
+        'agent_output': agent_output,
         'route_comparison': route_data,
         'origin_port_status': origin_congestion,
         'dest_port_status': dest_congestion,
-        'optimal_decision': optimal_decision
-    }
\ No newline at end of file
+        'optimal_decision': optimal_decision,
+        'decision_source': decision_source,
+        'carbon_tax_rate': carbon_tax_rate,
+        'run_metrics': {
+            'mode': 'compact' if compact else 'tools',
+            'tier': tier,
+            'score_spread': spread,
+            'latency_s': round(latency, 2),
+            'total_tokens': total_tokens,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'llm_round_trips': round_trips
+        }
+    }
+
+def deploy_swarm(session_state, origin, dest, weight, llm=None):
+    """
+    The dashboard's DEPLOY AGENT SWARM handler: run the swarm with the session's
+    trilemma weights, carbon tax and context/routing toggles, and store the result
+    where the result tabs read it. Takes st.session_state or a plain dict.
+    
+    Returns:
+        The initiate_swarm() result
+    """
+    result = initiate_swarm(
+        origin, dest, weight,
+        trilemma_weights=session_state.get('trilemma_weights', {'cost': 0.33, 'carbon': 0.33, 'time': 0.34}),
+        carbon_tax_rate=session_state.get('carbon_tax_input', 100),
+        compact=session_state.get('compact_context', False),
+        routing=session_state.get('model_routing', False),
+        llm=llm
+    )
+    session_state['agent_result'] = result
+    session_state['origin'] = origin
+    session_state['dest'] = dest
+    session_state['weight'] = weight
+    return result
@@ -3,7 +3,9 @@ import base64
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
-from agents import initiate_swarm
+from agents import deploy_swarm
+from model_router import tier_metrics
+from scheduling import best_departures, DEFAULT_DEADLINE_DAYS
 
 # --- INITIAL CONFIG ---
 st.set_page_config(page_title="CARBON AI | THIRAN 2026", layout="wide", initial_sidebar_state="expanded")
@@ -69,6 +71,19 @@ with st.sidebar:
             st.session_state['shock_triggered'] = False
             st.rerun()
     
+    st.checkbox(
+        "⚡ Compact Agent Context",
+        value=False,
+        key="compact_context",
+        help="Precompute route and congestion data and hand it to the agents directly (no tool round-trips)"
+    )
+    st.checkbox(
+        "🧭 Adaptive Model Routing",
+        value=False,
+        key="model_routing",
+        help="Template or fast model for clear-cut decisions; full model only for close calls and congested routes"
+    )
+    
     st.divider()
     
     # Trilemma Optimization Weights
@@ -263,22 +278,9 @@ with col1:
     
     # Deploy button
     if st.button("🚀 DEPLOY AGENT SWARM", use_container_width=True):
-        # Get trilemma weights from session state
-        weights = st.session_state.get('trilemma_weights', {
-            'cost': 0.33,
-            'carbon': 0.33,
-            'time': 0.34
-        })
-        
-        # Get current carbon tax rate
-        current_tax = st.session_state.get('carbon_tax_input', 100)
-        
+        # Trilemma weights, carbon tax and mode toggles come from session state
         with st.spinner("🤖 Agents analyzing routes..."):
-            result = initiate_swarm(origin, dest, weight, trilemma_weights=weights, carbon_tax_rate=current_tax)
-            st.session_state['agent_result'] = result
-            st.session_state['origin'] = origin
-            st.session_state['dest'] = dest
-            st.session_state['weight'] = weight
+            deploy_swarm(st.session_state, origin, dest, weight)
         st.success("✅ Analysis Complete!")
         st.rerun()
 
@@ -323,7 +325,8 @@ with col2:
         if current_weights and current_weights != {'cost': 0.33, 'carbon': 0.33, 'time': 0.34}:
             weight_text = f"🎯 Weights: Cost {current_weights['cost']:.0%} | Carbon {current_weights['carbon']:.0%} | Time {current_weights['time']:.0%} • "
         
-        st.caption(f"{weight_text}💰 Carbon Tax: ${current_tax}/tonne CO₂")
+        source_text = " • ⚡ Served from decision table" if result.get('decision_source') == 'table' else ""
+        st.caption(f"{weight_text}💰 Carbon Tax: ${current_tax}/tonne CO₂{source_text}")
         
         st.divider()
         
@@ -492,9 +495,53 @@ with col2:
                 height=300
             )
             st.plotly_chart(fig_gauge, use_container_width=True)
+            
+            # Departure planning with time-varying congestion
+            st.markdown("#### 📅 Best Departure (Next 30 Days)")
+            deadline_days = st.number_input(
+                "Delivery Deadline (days from today)",
+                value=DEFAULT_DEADLINE_DAYS,
+                min_value=1,
+                step=5,
+                help="Cheapest departure in the next 30 days that still arrives by this deadline"
+            )
+            departures = best_departures(
+                [(st.session_state['origin'], st.session_state['dest'])],
+                st.session_state['weight'],
+                deadline_days=deadline_days,
+                carbon_tax_rate=result['carbon_tax_rate']
+            )
+            df_departures = pd.DataFrame(departures)
+            df_departures['cheapest_on_time_departure'] = df_departures['cheapest_on_time_departure'].fillna('Misses deadline')
+            st.dataframe(
+                df_departures[['mode', 'cheapest_on_time_departure', 'cheapest_on_time_cost_usd', 'earliest_arrival', 'transit_days', 'port_delay_days']].style.format({
+                    'cheapest_on_time_cost_usd': lambda v: f"${v:,.2f}" if pd.notna(v) else "—",
+                    'transit_days': '{:.1f}',
+                    'port_delay_days': '{:.1f}'
+                }),
+                use_container_width=True
+            )
+            st.caption("💡 Door-to-door days include terminal dwell and congestion delay on the actual departure/arrival dates; earliest arrival assumes departing today")
         
         with tab4:
             st.markdown("#### Agent Deliberation Output")
+            
+            metrics = result.get('run_metrics')
+            if metrics:
+                col_m1, col_m2, col_m3 = st.columns(3)
+                col_m1.metric("Swarm Latency", f"{metrics['latency_s']:.1f} s")
+                col_m2.metric("Tokens", f"{metrics['total_tokens']:,}", help=f"{metrics['prompt_tokens']:,} prompt / {metrics['completion_tokens']:,} completion")
+                col_m3.metric("LLM Round-Trips", metrics['llm_round_trips'])
+                st.caption(f"Context mode: {metrics['mode']}" + (f" • Model tier: {metrics['tier']}" if metrics.get('tier') else ""))
+                
+                if metrics.get('tier'):
+                    with st.expander("🧭 Routing Tier Mix (this server)", expanded=False):
+                        df_tiers = pd.DataFrame.from_dict(tier_metrics.report(), orient='index')
+                        st.dataframe(
+                            df_tiers.style.format({'share': '{:.0%}', 'avg_latency_s': '{:.2f}', 'avg_tokens': '{:,.0f}'}),
+                            use_container_width=True
+                        )
+            
             st.markdown(result['agent_output'])
     
     else:
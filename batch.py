@@ -0,0 +1,362 @@
+"""
+Sharded batch re-pricing over a durable SQLite job queue.
+
+A coordinator splits a shipment manifest (CSV with origin, destination, weight and
+an optional shipment_id) into shards on the queue. Workers on any node that can
+reach the queue file claim shards under a lease, run the calculator and route
+selector, and write one output partition per shard. Partitions are written
+atomically and keyed by shard, so a retried shard simply overwrites its own output.
+
+SQLite is the local stand-in for a real queue: across nodes the file must sit on
+storage with working file locks, and the queue uses SQLite's default rollback
+journal because WAL needs shared memory between all processes and does not work
+over a network filesystem. A queue whose workers all run on one host can be
+submitted with --wal for cheaper concurrent reads and commits.
+
+Usage:
+    python batch.py submit manifest.csv --queue queue.db --shard-size 500 [--wal]
+    python batch.py work --queue queue.db --out priced/ --processes 4 [--matrix carbonix_matrix]
+    python batch.py status --queue queue.db
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import tools
+from agents import select_optimal_route
+from matrix import open_matrix
+from tools import LogisticsTools
+
+DEFAULT_SHARD_SIZE = 500
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 3
+
+# Factor tables a job may override for re-pricing
+FACTOR_TABLES = ('EMISSION_FACTORS', 'COST_FACTORS', 'TIME_FACTORS')
+
+OUTPUT_FIELDS = [
+    'shipment_id', 'origin', 'destination', 'weight', 'selected_mode', 'trilemma_score',
+    'emissions_tonnes', 'total_cost_usd', 'carbon_tax_usd', 'transit_days', 'error'
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    manifest TEXT NOT NULL,
+    factors TEXT,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shards (
+    job_id INTEGER NOT NULL,
+    shard INTEGER NOT NULL,
+    rows TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_until REAL,
+    worker TEXT,
+    error TEXT,
+    PRIMARY KEY (job_id, shard)
+);
+CREATE INDEX IF NOT EXISTS shards_status ON shards (status, job_id, shard);
+"""
+
+
+def connect(queue_path, wal=None):
+    """
+    Open the queue database, creating the schema on first use.
+    The journal mode is stored in the file: wal=True switches it to WAL (single host
+    only), wal=False back to the rollback journal, None keeps whatever it was created with.
+    """
+    conn = sqlite3.connect(queue_path, timeout=30, isolation_level=None)
+    if wal is not None:
+        conn.execute(f"PRAGMA journal_mode={'WAL' if wal else 'DELETE'}")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+@contextmanager
+def _transaction(conn):
+    """Write transaction that takes the lock up front, so claims never race."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def submit_manifest(queue_path, manifest_path, shard_size=DEFAULT_SHARD_SIZE, factors=None, wal=False):
+    """
+    Split a manifest CSV into shards on the queue.
+    wal=True puts the queue in WAL mode; only safe when every worker runs on this host.
+
+    Returns:
+        Tuple of (job id, number of shards)
+    """
+    with open(manifest_path, newline='') as f:
+        rows = list(csv.DictReader(f))
+
+    for i, row in enumerate(rows):
+        row.setdefault('shipment_id', str(i))
+
+    conn = connect(queue_path, wal=wal)
+    try:
+        with _transaction(conn):
+            job_id = conn.execute(
+                "INSERT INTO jobs (manifest, factors, created) VALUES (?, ?, ?)",
+                (os.path.abspath(manifest_path), json.dumps(factors) if factors else None, time.time())
+            ).lastrowid
+            shards = [
+                (job_id, n, json.dumps(rows[start:start + shard_size]))
+                for n, start in enumerate(range(0, len(rows), shard_size))
+            ]
+            conn.executemany("INSERT INTO shards (job_id, shard, rows) VALUES (?, ?, ?)", shards)
+    finally:
+        conn.close()
+
+    return job_id, len(shards)
+
+
+def claim_shard(conn, worker_id, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+    """
+    Lease the next pending shard, or one whose previous worker's lease ran out.
+
+    Returns:
+        (job_id, shard, rows, factors) or None when nothing is claimable
+    """
+    now = time.time()
+    with _transaction(conn):
+        # Shards abandoned on their last attempt will never be picked up again
+        conn.execute(
+            "UPDATE shards SET status = 'failed', error = COALESCE(error, 'lease expired') "
+            "WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+            (now, max_attempts)
+        )
+        row = conn.execute(
+            "SELECT s.job_id, s.shard, s.rows, j.factors FROM shards s JOIN jobs j ON j.id = s.job_id "
+            "WHERE s.status = 'pending' OR (s.status = 'running' AND s.lease_until < ?) "
+            "ORDER BY s.job_id, s.shard LIMIT 1",
+            (now,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        job_id, shard, rows, factors = row
+        conn.execute(
+            "UPDATE shards SET status = 'running', attempts = attempts + 1, lease_until = ?, worker = ? "
+            "WHERE job_id = ? AND shard = ?",
+            (now + lease_seconds, worker_id, job_id, shard)
+        )
+
+    return job_id, shard, json.loads(rows), json.loads(factors) if factors else None
+
+
+def finish_shard(conn, job_id, shard, worker_id, error=None, max_attempts=MAX_ATTEMPTS):
+    """Mark a leased shard done, or return it to the queue (failed after max_attempts)."""
+    with _transaction(conn):
+        if error is None:
+            conn.execute(
+                "UPDATE shards SET status = 'done', error = NULL WHERE job_id = ? AND shard = ? AND worker = ?",
+                (job_id, shard, worker_id)
+            )
+        else:
+            conn.execute(
+                "UPDATE shards SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "error = ? WHERE job_id = ? AND shard = ? AND worker = ?",
+                (max_attempts, error, job_id, shard, worker_id)
+            )
+
+
+@contextmanager
+def factor_overrides(factors):
+    """Temporarily apply a job's factor overrides to the calculator's tables."""
+    saved = {name: dict(getattr(tools, name)) for name in FACTOR_TABLES}
+    try:
+        for name, values in (factors or {}).items():
+            if name in FACTOR_TABLES:
+                getattr(tools, name).update(values)
+        yield
+    finally:
+        for name, values in saved.items():
+            table = getattr(tools, name)
+            table.clear()
+            table.update(values)
+
+
+def _price_row(row, congestion_cache, compare_routes):
+    origin, destination, weight = row['origin'], row['destination'], float(row['weight'])
+    for port in (origin, destination):
+        if port not in congestion_cache:
+            congestion_cache[port] = LogisticsTools.get_port_congestion(port)
+
+    route_data = compare_routes(origin, destination, weight)
+    decision = select_optimal_route(route_data, congestion_cache[origin], congestion_cache[destination])
+    route = decision['selected_route']
+    return {
+        'shipment_id': row['shipment_id'],
+        'origin': origin,
+        'destination': destination,
+        'weight': weight,
+        'selected_mode': decision['selected_mode'],
+        'trilemma_score': decision['trilemma_score'],
+        'emissions_tonnes': route['emissions_tonnes'],
+        'total_cost_usd': route['total_cost_usd'],
+        'carbon_tax_usd': route['carbon_tax_usd'],
+        'transit_days': route['transit_days'],
+        'error': ''
+    }
+
+
+def price_rows(rows, congestion_cache=None, matrix=None):
+    """
+    Run the calculator (or a shared CostMatrix) and route selector over manifest rows.
+    A row that can't be priced (bad weight, missing column) is kept with its error
+    instead of failing the shard, since retrying would fail the same way.
+    """
+    congestion_cache = {} if congestion_cache is None else congestion_cache
+    compare_routes = matrix.compare_routes if matrix is not None else LogisticsTools.compare_routes
+    priced = []
+    for row in rows:
+        try:
+            priced.append(_price_row(row, congestion_cache, compare_routes))
+        except (KeyError, TypeError, ValueError) as e:
+            priced.append({
+                'shipment_id': row.get('shipment_id'),
+                'origin': row.get('origin'),
+                'destination': row.get('destination'),
+                'weight': row.get('weight'),
+                'error': f"{type(e).__name__}: {e}"
+            })
+    return priced
+
+
+def write_partition(out_dir, job_id, shard, priced):
+    """Write one shard's output atomically; re-running a shard replaces its partition."""
+    job_dir = os.path.join(out_dir, f"job={job_id}")
+    os.makedirs(job_dir, exist_ok=True)
+    path = os.path.join(job_dir, f"part-{shard:05d}.csv")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+
+    with open(tmp_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=OUTPUT_FIELDS)
+        writer.writeheader()
+        writer.writerows(priced)
+    os.replace(tmp_path, path)
+    return path
+
+
+def run_worker(queue_path, out_dir, wait=False, matrix_path=None, poll_seconds=2.0):
+    """
+    Pull and price shards until the queue is drained (or forever with wait=True).
+    With matrix_path, legs are read from the memory-mapped cost matrix; jobs with
+    factor overrides still use the live calculator since the matrix bakes factors in.
+
+    Returns:
+        Number of shards completed by this worker
+    """
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    conn = connect(queue_path)
+    matrix = open_matrix(matrix_path) if matrix_path else None
+    congestion_cache = {}
+    completed = 0
+
+    try:
+        while True:
+            claimed = claim_shard(conn, worker_id)
+            if claimed is None:
+                if not wait:
+                    return completed
+                time.sleep(poll_seconds)
+                continue
+
+            job_id, shard, rows, factors = claimed
+            if matrix is not None:
+                # A rebuild between shards must not leave this worker on the old mapping
+                matrix.refresh()
+            try:
+                with factor_overrides(factors):
+                    priced = price_rows(rows, congestion_cache, None if factors else matrix)
+                write_partition(out_dir, job_id, shard, priced)
+            except Exception as e:
+                finish_shard(conn, job_id, shard, worker_id, error=f"{type(e).__name__}: {e}")
+            else:
+                finish_shard(conn, job_id, shard, worker_id)
+                completed += 1
+    finally:
+        conn.close()
+
+
+def queue_status(queue_path):
+    """Shard counts per job and status."""
+    conn = connect(queue_path)
+    try:
+        status = {}
+        for job_id, state, count in conn.execute(
+            "SELECT job_id, status, COUNT(*) FROM shards GROUP BY job_id, status ORDER BY job_id"
+        ):
+            status.setdefault(job_id, {})[state] = count
+        return status
+    finally:
+        conn.close()
+
+
+def _worker_process(args):
+    return run_worker(*args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded Carbonix batch re-pricing")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    submit = sub.add_parser('submit', help="Split a manifest into shards on the queue")
+    submit.add_argument('manifest')
+    submit.add_argument('--queue', required=True)
+    submit.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE)
+    submit.add_argument('--factors', help="JSON file overriding EMISSION_FACTORS / COST_FACTORS / TIME_FACTORS")
+    submit.add_argument('--wal', action='store_true', help="WAL journal; single-host workers only, never on a network filesystem")
+
+    work = sub.add_parser('work', help="Run workers on this node")
+    work.add_argument('--queue', required=True)
+    work.add_argument('--out', required=True)
+    work.add_argument('--processes', type=int, default=1)
+    work.add_argument('--wait', action='store_true', help="Keep polling after the queue drains")
+    work.add_argument('--matrix', help="Cost matrix built with matrix.py (path without extension)")
+
+    status = sub.add_parser('status', help="Show shard progress")
+    status.add_argument('--queue', required=True)
+
+    args = parser.parse_args()
+
+    if args.command == 'submit':
+        factors = None
+        if args.factors:
+            with open(args.factors) as f:
+                factors = json.load(f)
+        job_id, n_shards = submit_manifest(args.queue, args.manifest, args.shard_size, factors, wal=args.wal)
+        print(f"Job {job_id}: {n_shards} shards queued")
+
+    elif args.command == 'work':
+        started = time.perf_counter()
+        worker_args = [(args.queue, args.out, args.wait, args.matrix)] * args.processes
+        if args.processes == 1:
+            completed = [_worker_process(worker_args[0])]
+        else:
+            with multiprocessing.Pool(args.processes) as pool:
+                completed = pool.map(_worker_process, worker_args)
+        elapsed = time.perf_counter() - started
+        print(f"{sum(completed)} shards in {elapsed:.1f}s across {args.processes} worker(s)")
+
+    elif args.command == 'status':
+        for job_id, counts in queue_status(args.queue).items():
+            print(f"Job {job_id}: " + ", ".join(f"{state}={n}" for state, n in sorted(counts.items())))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Concurrency benchmark for the async tool implementations.
+
+Simulates many crews sharing one event loop. Each crew alternates a simulated LLM
+turn with a tool call and now and then prices a batch of shipments. Native _arun
+calls are compared against the thread-per-call fallback (asyncio.to_thread around
+the sync _run) that an async runtime would otherwise use.
+
+Usage:
+    python bench_async.py --crews 200 --calls 20
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+
+from tools import CarbonCalculatorTool, PortCongestionTool, RouteCompareTool, LogisticsTools
+
+LANES = [
+    ('Shanghai', 'Rotterdam'),
+    ('Singapore', 'London'),
+    ('Mumbai', 'Hamburg'),
+    ('Dubai', 'Amsterdam')
+]
+
+# Every Nth tool call in a crew is a batch re-pricing instead of a single lookup
+BATCH_EVERY = 10
+BATCH_SIZE = 200
+
+
+def _tool_call(tools, i):
+    origin, dest = LANES[i % len(LANES)]
+    calc, congestion, compare = tools
+    if i % 3 == 0:
+        return calc, {'origin': origin, 'destination': dest, 'weight': 100.0, 'mode': 'sea'}
+    if i % 3 == 1:
+        return congestion, {'port_name': origin}
+    return compare, {'origin': origin, 'destination': dest, 'weight': 100.0}
+
+
+async def _crew(crew_id, calls, think_s, native, latencies, peak_threads):
+    tools = (CarbonCalculatorTool(), PortCongestionTool(), RouteCompareTool())
+    batch = [(o, d, 50.0 + n) for n, (o, d) in enumerate(LANES * (BATCH_SIZE // len(LANES)))]
+
+    for i in range(calls):
+        # Simulated LLM turn; this is where other crews interleave
+        await asyncio.sleep(think_s)
+
+        started = time.perf_counter()
+        if i % BATCH_EVERY == BATCH_EVERY - 1:
+            if native:
+                await LogisticsTools.compare_routes_batch_async(batch)
+            else:
+                await asyncio.to_thread(LogisticsTools.compare_routes_batch, batch)
+        else:
+            tool, kwargs = _tool_call(tools, crew_id + i)
+            if native:
+                await tool.arun(**kwargs)
+            else:
+                await asyncio.to_thread(tool._run, **kwargs)
+        latencies.append(time.perf_counter() - started)
+        peak_threads[0] = max(peak_threads[0], threading.active_count())
+
+
+async def _run(crews, calls, think_s, native):
+    latencies = []
+    peak_threads = [threading.active_count()]
+    started = time.perf_counter()
+    await asyncio.gather(*(_crew(c, calls, think_s, native, latencies, peak_threads) for c in range(crews)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'wall_s': wall,
+        'calls_per_s': len(latencies) / wall,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        'peak_threads': peak_threads[0]
+    }
+
+
+def run_benchmark(crews=200, calls=20, think_ms=5.0):
+    """
+    Run the same workload with native _arun and with the to_thread fallback.
+
+    Returns:
+        Dictionary of metrics per variant
+    """
+    # Start the batch worker pool up front so its startup isn't billed to the first batches
+    asyncio.run(LogisticsTools.compare_routes_batch_async([(o, d, 100.0) for o, d in LANES]))
+
+    results = {}
+    for label, native in (('to_thread', False), ('native_arun', True)):
+        results[label] = asyncio.run(_run(crews, calls, think_ms / 1000, native))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent async tool calls")
+    parser.add_argument('--crews', type=int, default=200)
+    parser.add_argument('--calls', type=int, default=20, help="Tool calls per crew")
+    parser.add_argument('--think-ms', type=float, default=5.0, help="Simulated LLM time between calls")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.crews, args.calls, args.think_ms)
+    print(f"{args.crews} crews x {args.calls} tool calls")
+    print(f"{'variant':<12} {'wall s':>8} {'calls/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'threads':>8}")
+    for label, r in results.items():
+        print(f"{label:<12} {r['wall_s']:>8.2f} {r['calls_per_s']:>9.0f} {r['p50_ms']:>8.2f} "
+              f"{r['p95_ms']:>8.2f} {r['peak_threads']:>8}")
+
+
+if __name__ == '__main__':
+    main()
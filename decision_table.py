@@ -0,0 +1,269 @@
+"""
+Precomputed lane decision table.
+
+Most requests hit the demo lanes with standard weights, carbon tax levels and trilemma
+weight presets, where select_optimal_route always gives the same answer. The table
+stores that answer (route comparison, port status and decision with reasoning) per
+lane x weight x tax x preset, so serving it is a single dict lookup. Keys are exact
+bucket values rather than ranges because the reasoning quotes exact costs; anything
+else falls through to live computation.
+
+Each lane carries a fingerprint of its distances, the factor tables and its port
+congestion, so a rebuild only recomputes lanes whose inputs changed. Lookups also
+check the lane's distances and factor tables against what the table was built from
+and treat a mismatch as a miss, so a stale table never serves old answers.
+
+If the table file is missing, the first get_decision() in a process builds it for
+the demo lanes (a fraction of a second). Run the CLI as a deploy step to add lanes
+or to refresh lanes after distance or factor changes.
+
+Usage:
+    python decision_table.py build [--lane Tokyo:Boston]
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import threading
+
+import tools
+from tools import LogisticsTools
+
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'decision_table.json')
+
+# Bumped when the key or file layout changes; older tables are rebuilt from scratch
+TABLE_FORMAT = 2
+
+# Standard cargo weights (tonnes) and carbon tax levels ($/tonne CO2, incl. the +40% shock)
+WEIGHT_BUCKETS = (10, 50, 100, 200, 500, 1000)
+TAX_BUCKETS = (50, 100, 140, 150, 200)
+
+# Trilemma weight presets; 'balanced' is the dashboard default
+WEIGHT_PRESETS = {
+    'balanced': {'cost': 0.33, 'carbon': 0.33, 'time': 0.34},
+    'cost_first': {'cost': 0.6, 'carbon': 0.2, 'time': 0.2},
+    'carbon_first': {'cost': 0.2, 'carbon': 0.6, 'time': 0.2},
+    'time_first': {'cost': 0.2, 'carbon': 0.2, 'time': 0.6}
+}
+
+
+def _entry_key(origin, destination, weight, carbon_tax_rate, preset):
+    # repr keeps every digit, so only exact bucket values ever hit
+    return f"{origin}|{destination}|{float(weight)!r}|{float(carbon_tax_rate)!r}|{preset}"
+
+
+def _preset_name(weights):
+    """Name of the preset matching these trilemma weights, if any."""
+    if weights is None:
+        return 'balanced'
+    for name, preset in WEIGHT_PRESETS.items():
+        if all(round(weights.get(k, -1), 4) == round(v, 4) for k, v in preset.items()):
+            return name
+    return None
+
+
+def _source_fingerprint(origin, destination):
+    """Hash of the lane's distances and the factor tables; cheap enough to check per lookup."""
+    payload = {
+        'distances': tools.DISTANCES.get((origin, destination)),
+        'emission_factors': tools.EMISSION_FACTORS,
+        'cost_factors': tools.COST_FACTORS,
+        'time_factors': tools.TIME_FACTORS
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def _source_state(origin, destination):
+    """Cheap, hashable snapshot of the inputs _source_fingerprint hashes."""
+    return (
+        origin,
+        destination,
+        tuple(sorted((tools.DISTANCES.get((origin, destination)) or {}).items())),
+        tuple(sorted(tools.EMISSION_FACTORS.items())),
+        tuple(sorted(tools.COST_FACTORS.items())),
+        tuple(sorted(tools.TIME_FACTORS.items()))
+    )
+
+
+def _lane_fingerprint(origin, destination):
+    """Hash of everything a lane's decisions depend on."""
+    payload = {
+        'sources': _source_fingerprint(origin, destination),
+        'congestion': [LogisticsTools.get_port_congestion(origin), LogisticsTools.get_port_congestion(destination)],
+        'weights': WEIGHT_BUCKETS,
+        'taxes': TAX_BUCKETS,
+        'presets': WEIGHT_PRESETS
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def compute_decision(origin, destination, weight, carbon_tax_rate=100, weights=None):
+    """
+    Live route analysis: comparison, port status and trilemma decision.
+
+    Returns:
+        Dictionary with route_comparison, origin_port_status, dest_port_status, optimal_decision
+    """
+    from agents import select_optimal_route
+
+    route_data = LogisticsTools.compare_routes(origin, destination, weight, carbon_tax_rate)
+    origin_congestion = LogisticsTools.get_port_congestion(origin)
+    dest_congestion = LogisticsTools.get_port_congestion(destination)
+    optimal_decision = select_optimal_route(route_data, origin_congestion, dest_congestion, weights)
+
+    return {
+        'route_comparison': route_data,
+        'origin_port_status': origin_congestion,
+        'dest_port_status': dest_congestion,
+        'optimal_decision': optimal_decision
+    }
+
+
+def _load(path):
+    empty = {'format': TABLE_FORMAT, 'fingerprints': {}, 'sources': {}, 'entries': {}}
+    if not os.path.exists(path):
+        return empty
+    with open(path) as f:
+        table = json.load(f)
+    return table if table.get('format') == TABLE_FORMAT else empty
+
+
+def build_decision_table(path=DEFAULT_TABLE_PATH, lanes=None):
+    """
+    Build or incrementally refresh the table at path.
+    Lanes default to every lane in DISTANCES; lanes whose fingerprint is unchanged are kept.
+
+    Returns:
+        Number of lanes recomputed
+    """
+    lanes = list(tools.DISTANCES) if lanes is None else [tuple(lane) for lane in lanes]
+    table = _load(path)
+    fingerprints, sources, entries = table['fingerprints'], table['sources'], table['entries']
+
+    # Drop lanes that are no longer requested
+    wanted = {f"{o}|{d}" for o, d in lanes}
+    for lane_key in set(fingerprints) - wanted:
+        del fingerprints[lane_key]
+        sources.pop(lane_key, None)
+    table['entries'] = entries = {k: v for k, v in entries.items() if '|'.join(k.split('|')[:2]) in wanted}
+
+    rebuilt = 0
+    for origin, destination in lanes:
+        lane_key = f"{origin}|{destination}"
+        fingerprint = _lane_fingerprint(origin, destination)
+        if fingerprints.get(lane_key) == fingerprint:
+            continue
+
+        for weight in WEIGHT_BUCKETS:
+            for tax in TAX_BUCKETS:
+                for preset, weights in WEIGHT_PRESETS.items():
+                    entries[_entry_key(origin, destination, weight, tax, preset)] = compute_decision(
+                        origin, destination, weight, tax, dict(weights)
+                    )
+        fingerprints[lane_key] = fingerprint
+        sources[lane_key] = _source_fingerprint(origin, destination)
+        rebuilt += 1
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(table, f)
+    os.replace(tmp_path, path)
+
+    return rebuilt
+
+
+# Per-process table, reloaded when the file on disk is rebuilt. Entries are kept
+# pickled so each hit hands out a private copy far cheaper than deepcopy, and
+# 'verified' caches each lane's fingerprint check per snapshot of its inputs.
+_table = {'path': None, 'mtime': None, 'sources': {}, 'entries': {}, 'verified': {}}
+
+
+def lookup_decision(origin, destination, weight, carbon_tax_rate=100, weights=None, path=DEFAULT_TABLE_PATH):
+    """
+    O(1) lookup of a precomputed analysis.
+
+    Returns:
+        Same shape as compute_decision(), or None on a miss
+    """
+    preset = _preset_name(weights)
+    if preset is None:
+        return None
+
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    if _table['path'] != path or _table['mtime'] != mtime:
+        loaded = _load(path)
+        entries = {key: pickle.dumps(entry, pickle.HIGHEST_PROTOCOL) for key, entry in loaded['entries'].items()}
+        _table.update(path=path, mtime=mtime, sources=loaded['sources'], entries=entries, verified={})
+
+    stored = _table['sources'].get(f"{origin}|{destination}")
+    if stored is None:
+        return None
+
+    # Distances or factors changed since the build: the stored answers are stale.
+    # The full hash only runs when the lane's inputs differ from every state seen before.
+    state = _source_state(origin, destination)
+    fresh = _table['verified'].get(state)
+    if fresh is None:
+        fresh = _table['verified'][state] = stored == _source_fingerprint(origin, destination)
+    if not fresh:
+        return None
+
+    entry = _table['entries'].get(_entry_key(origin, destination, weight, carbon_tax_rate, preset))
+    # Callers annotate the result, so hand out a private copy
+    return pickle.loads(entry) if entry is not None else None
+
+
+_build_lock = threading.Lock()
+_build_attempted = set()
+
+
+def _ensure_table(path=DEFAULT_TABLE_PATH):
+    """Build a missing table once per process; failures (e.g. read-only disk) fall back to live."""
+    if os.path.exists(path) or path in _build_attempted:
+        return
+    with _build_lock:
+        if os.path.exists(path) or path in _build_attempted:
+            return
+        _build_attempted.add(path)
+        try:
+            build_decision_table(path)
+        except OSError:
+            pass
+
+
+def get_decision(origin, destination, weight, carbon_tax_rate=100, weights=None, path=DEFAULT_TABLE_PATH):
+    """
+    Table lookup with live computation on a miss.
+
+    Returns:
+        (analysis dict, 'table' or 'live')
+    """
+    _ensure_table(path)
+    analysis = lookup_decision(origin, destination, weight, carbon_tax_rate, weights, path)
+    if analysis is not None:
+        return analysis, 'table'
+    return compute_decision(origin, destination, weight, carbon_tax_rate, weights), 'live'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the Carbonix lane decision table")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help="Build or incrementally refresh the table")
+    build.add_argument('--path', default=DEFAULT_TABLE_PATH)
+    build.add_argument('--lane', action='append', default=[], help="Extra lane as Origin:Destination (repeatable)")
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        lanes = list(tools.DISTANCES) + [tuple(lane.split(':', 1)) for lane in args.lane]
+        rebuilt = build_decision_table(args.path, lanes)
+        print(f"{rebuilt} lane(s) rebuilt in {args.path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,436 @@
+"""
+Concurrent-user load test for a Carbonix deployment.
+
+Virtual users run the dashboard's deploy handler (agents.deploy_swarm, the same
+function app.py calls) plus the result tabs' heaviest data work (route table and
+departure planner) against a stubbed LLM with configurable latency. This is a
+partial stand-in for a dashboard session: Streamlit's script reruns, widget and
+chart rendering and websocket traffic are not included, so the saturation point
+measures the swarm backend, not the capacity of a deployed dashboard. Users are ramped in stages, each stage reporting throughput,
+p50/p95/p99 session latency, errors and memory growth, and the saturation point is
+the last stage where adding users still bought throughput within the latency SLO.
+
+Save a report and pass it back as --baseline to fail the run (exit 1) on a
+concurrency regression.
+
+Usage:
+    python loadtest.py --stages 1,2,4,8,16 --stage-seconds 20 --llm-latency-ms 200
+    python loadtest.py --save baseline.json
+    python loadtest.py --baseline baseline.json
+    python loadtest.py --compare-modes
+"""
+import os
+
+# Keep the harness hermetic: no telemetry calls out of the stubbed runs
+os.environ.setdefault('CREWAI_DISABLE_TELEMETRY', 'true')
+os.environ.setdefault('OTEL_SDK_DISABLED', 'true')
+os.environ.setdefault('OPENAI_API_KEY', 'loadtest-stub')
+
+import argparse
+import contextlib
+import json
+import random
+import re
+import resource
+import sys
+import threading
+import time
+
+import pandas as pd
+from crewai import BaseLLM
+
+from agents import deploy_swarm
+from model_router import tier_metrics
+from scheduling import best_departures, DEFAULT_DEADLINE_DAYS
+
+# Demo routes offered by the dashboard's quick select
+ROUTES = [
+    ("Shanghai", "Rotterdam"),
+    ("Singapore", "London"),
+    ("Mumbai", "Hamburg"),
+    ("Dubai", "Amsterdam")
+]
+
+DEFAULT_STAGES = (1, 2, 4, 8, 16, 32)
+
+# A stage is saturated when it adds less than this throughput over the previous one...
+SATURATION_GAIN = 0.10
+# ...or its p95 session latency breaks the SLO
+DEFAULT_P95_SLO_S = 10.0
+
+# Allowed slack against a baseline report before the run is flagged as a regression
+DEFAULT_TOLERANCE = 0.20
+
+
+# Rough prompt/completion token estimate for the stub (OpenAI-style English text)
+CHARS_PER_TOKEN = 4
+
+_TASK_LANE = re.compile(r"from (.+?) to (.+?)\.")
+_TASK_WEIGHT = re.compile(r"shipping ([\d.]+) tonnes")
+_TASK_TAX = re.compile(r"carbon_tax_rate=([\d.]+)")
+
+
+class StubLLM(BaseLLM):
+    """
+    LLM stand-in that answers after a configurable delay. When the agent has tools it
+    makes the calls its task asks for (one Route Comparer call, or a Port Congestion
+    Checker call per port) before answering, and it reports estimated token usage, so
+    tools and compact mode can be compared round-trip for round-trip.
+    """
+
+    latency_s: float = 0.2
+    jitter_s: float = 0.05
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        time.sleep(max(self.latency_s + random.uniform(-self.jitter_s, self.jitter_s), 0))
+        if isinstance(messages, str):
+            messages = [{'role': 'user', 'content': messages}]
+        prompt = "\n".join(str(m.get('content') or '') for m in messages)
+
+        response = self._tool_action(prompt) or "Thought: I now know the final answer\nFinal Answer: Stubbed analysis for load testing."
+        self._track_token_usage_internal({
+            'prompt_tokens': len(prompt) // CHARS_PER_TOKEN,
+            'completion_tokens': len(response) // CHARS_PER_TOKEN
+        })
+        return response
+
+    def _tool_action(self, prompt):
+        """Next tool call the task asks for, or None once it has its observations."""
+        if 'Tool Name:' not in prompt:
+            return None
+        task = prompt[prompt.index('Current Task:'):]
+        origin, dest = _TASK_LANE.search(task).groups()
+        observations = task.count('Observation:')
+
+        if 'Port Congestion Checker' in task:
+            ports = (origin, dest)
+            if observations >= len(ports):
+                return None
+            return self._action('port_congestion_checker', {'port_name': ports[observations]})
+        if 'Route Comparer' in task and not observations:
+            tax = _TASK_TAX.search(task)
+            return self._action('route_comparer', {
+                'origin': origin,
+                'destination': dest,
+                'weight': float(_TASK_WEIGHT.search(task).group(1)),
+                'carbon_tax_rate': float(tax.group(1)) if tax else 100
+            })
+        return None
+
+    @staticmethod
+    def _action(tool, arguments):
+        return f"Thought: I need the tool output first\nAction: {tool}\nAction Input: {json.dumps(arguments)}"
+
+    def supports_function_calling(self):
+        return False
+
+    def get_context_window_size(self):
+        return 128000
+
+
+class SwarmSession:
+    """
+    Backend half of one dashboard session: app.py's shared deploy handler plus the
+    result tabs' data work. Not the full app.py flow - nothing is rendered.
+    """
+
+    def __init__(self, llm, compact=False, routing=False):
+        self.llm = llm
+        self.session_state = {
+            'trilemma_weights': {'cost': 0.33, 'carbon': 0.33, 'time': 0.34},
+            'carbon_tax_input': 100,
+            'compact_context': compact,
+            'model_routing': routing
+        }
+
+    def deploy(self, origin, dest, weight):
+        """The DEPLOY AGENT SWARM button handler (shared with app.py)."""
+        return deploy_swarm(self.session_state, origin, dest, weight, llm=self.llm)
+
+    def tab_data(self):
+        """
+        Data the result tabs compute on rerun: the route comparison frame and the
+        departure plan, as the Route Comparison and Port Status tabs build them.
+        Widgets and charts are not rendered.
+        """
+        state = self.session_state
+        routes = pd.DataFrame(state['agent_result']['route_comparison'])
+        departures = best_departures(
+            [(state['origin'], state['dest'])], state['weight'],
+            deadline_days=DEFAULT_DEADLINE_DAYS,
+            carbon_tax_rate=state['agent_result']['carbon_tax_rate']
+        )
+        return routes, departures
+
+
+def _rss_mb():
+    """Current resident set size (falls back to peak RSS off Linux)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@contextlib.contextmanager
+def _quiet_stdout():
+    """crewai logs every step to the terminal; silence fd 1 so the report stays readable."""
+    sys.stdout.flush()
+    saved = os.dup(1)
+    with open(os.devnull, 'w') as devnull:
+        os.dup2(devnull.fileno(), 1)
+        try:
+            yield
+        finally:
+            sys.stdout.flush()
+            os.dup2(saved, 1)
+            os.close(saved)
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * pct), len(sorted_values) - 1)]
+
+
+def _virtual_user(llm, options, stop, latencies, errors, lock, think_s):
+    session = SwarmSession(llm, **options)
+    rng = random.Random()
+    while not stop.is_set():
+        origin, dest = rng.choice(ROUTES)
+        weight = rng.choice((10, 50, 100, 200, 500))
+        started = time.perf_counter()
+        try:
+            session.deploy(origin, dest, weight)
+            session.tab_data()
+        except Exception as e:
+            with lock:
+                errors.append(f"{type(e).__name__}: {e}")
+        else:
+            with lock:
+                latencies.append(time.perf_counter() - started)
+        if think_s:
+            stop.wait(think_s)
+
+
+def run_stage(users, seconds, llm, options, think_s=0.0):
+    """
+    Drive `users` concurrent sessions for `seconds`.
+
+    Returns:
+        Stage metrics dictionary
+    """
+    latencies, errors = [], []
+    lock = threading.Lock()
+    stop = threading.Event()
+    rss_start = _rss_mb()
+
+    threads = [
+        threading.Thread(target=_virtual_user, args=(llm, options, stop, latencies, errors, lock, think_s), daemon=True)
+        for _ in range(users)
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'users': users,
+        'sessions': len(latencies),
+        'errors': len(errors),
+        'error_samples': sorted(set(errors))[:3],
+        'throughput_per_s': round(len(latencies) / elapsed, 3),
+        'p50_s': round(_percentile(latencies, 0.50), 3),
+        'p95_s': round(_percentile(latencies, 0.95), 3),
+        'p99_s': round(_percentile(latencies, 0.99), 3),
+        'rss_mb': round(_rss_mb(), 1),
+        'rss_growth_mb': round(_rss_mb() - rss_start, 1)
+    }
+
+
+def find_saturation(stages, p95_slo_s=DEFAULT_P95_SLO_S):
+    """
+    Last stage before throughput stopped scaling, errors appeared or p95 broke the SLO.
+
+    Returns:
+        (users at the last healthy stage or None if the first stage already failed,
+         whether saturation was reached at all - False means every stage was healthy
+         and the real saturation point lies beyond the ramp)
+    """
+    saturation = None
+    for i, stage in enumerate(stages):
+        if stage['errors'] or stage['p95_s'] > p95_slo_s:
+            return saturation, True
+        if i and stage['throughput_per_s'] < stages[i - 1]['throughput_per_s'] * (1 + SATURATION_GAIN):
+            return saturation, True
+        saturation = stage['users']
+    return saturation, False
+
+
+def run_load_test(stages=DEFAULT_STAGES, stage_seconds=20, llm_latency_ms=200, compact=False, routing=False,
+                  think_ms=0, p95_slo_s=DEFAULT_P95_SLO_S, stop_at_saturation=True):
+    """
+    Ramp virtual users through the given stages.
+
+    Returns:
+        Report with per-stage metrics, the saturation point and total memory growth
+    """
+    llm = StubLLM(model='stub', latency_s=llm_latency_ms / 1000, jitter_s=llm_latency_ms / 4000)
+    options = {'compact': compact, 'routing': routing}
+
+    # Warm-up so imports, agent variants and congestion caches don't count as growth
+    with _quiet_stdout():
+        SwarmSession(llm, **options).deploy(*ROUTES[0], 100)
+
+    tier_metrics.reset()
+    rss_start = _rss_mb()
+    results = []
+    for users in stages:
+        with _quiet_stdout():
+            results.append(run_stage(users, stage_seconds, llm, options, think_ms / 1000))
+        print(_format_stage(results[-1]), file=sys.stderr)
+        if stop_at_saturation and find_saturation(results, p95_slo_s)[1]:
+            break
+
+    saturation_users, saturation_reached = find_saturation(results, p95_slo_s)
+    return {
+        'config': {
+            'stage_seconds': stage_seconds,
+            'llm_latency_ms': llm_latency_ms,
+            'compact': compact,
+            'routing': routing,
+            'think_ms': think_ms,
+            'p95_slo_s': p95_slo_s
+        },
+        'stages': results,
+        'saturation_users': saturation_users,
+        'saturation_reached': saturation_reached,
+        'peak_throughput_per_s': max(s['throughput_per_s'] for s in results),
+        'memory_growth_mb': round(_rss_mb() - rss_start, 1),
+        'tiers': tier_metrics.report() if routing else None
+    }
+
+
+def compare_modes(lanes=ROUTES, weight=100, llm_latency_ms=200):
+    """
+    Run the same lanes once in tools mode and once in compact mode on the stub LLM.
+
+    Returns:
+        Per-mode averages of total/prompt tokens, LLM round-trips and latency
+    """
+    llm = StubLLM(model='stub', latency_s=llm_latency_ms / 1000, jitter_s=0)
+    results = {}
+    for mode, compact in (('tools', False), ('compact', True)):
+        runs = []
+        for origin, dest in lanes:
+            with _quiet_stdout():
+                runs.append(SwarmSession(llm, compact=compact).deploy(origin, dest, weight)['run_metrics'])
+        results[mode] = {
+            key: round(sum(r[key] for r in runs) / len(runs), 2)
+            for key in ('total_tokens', 'prompt_tokens', 'llm_round_trips', 'latency_s')
+        }
+    return results
+
+
+def compare_to_baseline(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Concurrency regressions versus a saved report.
+
+    Returns:
+        List of human-readable regression messages (empty when within tolerance)
+    """
+    regressions = []
+    if (baseline['saturation_users'] or 0) > (report['saturation_users'] or 0):
+        regressions.append(
+            f"saturation dropped from {baseline['saturation_users']} to {report['saturation_users']} users"
+        )
+    if report['peak_throughput_per_s'] < baseline['peak_throughput_per_s'] * (1 - tolerance):
+        regressions.append(
+            f"peak throughput {report['peak_throughput_per_s']}/s vs baseline {baseline['peak_throughput_per_s']}/s"
+        )
+
+    baseline_p95 = {s['users']: s['p95_s'] for s in baseline['stages']}
+    for stage in report['stages']:
+        before = baseline_p95.get(stage['users'])
+        if before and stage['p95_s'] > before * (1 + tolerance):
+            regressions.append(f"p95 at {stage['users']} users {stage['p95_s']}s vs baseline {before}s")
+    return regressions
+
+
+def _format_stage(s):
+    return (f"{s['users']:>5} users  {s['throughput_per_s']:>7.2f}/s  p50 {s['p50_s']:>6.2f}s  "
+            f"p95 {s['p95_s']:>6.2f}s  p99 {s['p99_s']:>6.2f}s  errors {s['errors']:>3}  "
+            f"rss {s['rss_mb']:>7.1f} MB (+{s['rss_growth_mb']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ramp concurrent planners against the Carbonix swarm")
+    parser.add_argument('--stages', default=','.join(map(str, DEFAULT_STAGES)), help="Comma-separated user counts")
+    parser.add_argument('--stage-seconds', type=float, default=20)
+    parser.add_argument('--llm-latency-ms', type=float, default=200, help="Stub LLM latency per call")
+    parser.add_argument('--think-ms', type=float, default=0, help="Pause between a user's sessions")
+    parser.add_argument('--compact', action='store_true', help="Run the swarm in compact context mode")
+    parser.add_argument('--routing', action='store_true', help="Enable adaptive model routing")
+    parser.add_argument('--p95-slo', type=float, default=DEFAULT_P95_SLO_S, help="p95 session latency SLO (s)")
+    parser.add_argument('--full-ramp', action='store_true', help="Keep ramping past the saturation point")
+    parser.add_argument('--save', help="Write the report as JSON")
+    parser.add_argument('--baseline', help="Baseline report JSON to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--compare-modes', action='store_true',
+                        help="Compare tools vs compact mode on the demo routes instead of ramping users")
+    args = parser.parse_args()
+
+    if args.compare_modes:
+        results = compare_modes(llm_latency_ms=args.llm_latency_ms)
+        print(f"{'mode':<8} {'tokens':>8} {'prompt':>8} {'round-trips':>12} {'latency s':>10}")
+        for mode, r in results.items():
+            print(f"{mode:<8} {r['total_tokens']:>8.0f} {r['prompt_tokens']:>8.0f} "
+                  f"{r['llm_round_trips']:>12.1f} {r['latency_s']:>10.2f}")
+        return
+
+    report = run_load_test(
+        stages=[int(n) for n in args.stages.split(',')],
+        stage_seconds=args.stage_seconds,
+        llm_latency_ms=args.llm_latency_ms,
+        compact=args.compact,
+        routing=args.routing,
+        think_ms=args.think_ms,
+        p95_slo_s=args.p95_slo,
+        stop_at_saturation=not args.full_ramp
+    )
+
+    if report['saturation_reached']:
+        saturation = f"{report['saturation_users']} users"
+    else:
+        saturation = f"not reached (healthy through {report['saturation_users']} users)"
+    print(f"Saturation point: {saturation}, "
+          f"peak {report['peak_throughput_per_s']:.2f} sessions/s, "
+          f"memory growth {report['memory_growth_mb']} MB", file=sys.stderr)
+    if report['tiers']:
+        for tier, t in report['tiers'].items():
+            print(f"{tier:>9} tier  {t['share']:>6.1%} of runs  avg {t['avg_latency_s']:.2f}s  "
+                  f"{t['avg_tokens']:.0f} tokens", file=sys.stderr)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['config'] != report['config']:
+            print("WARNING: baseline was recorded with a different configuration", file=sys.stderr)
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION: {message}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
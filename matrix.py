@@ -0,0 +1,236 @@
+"""
+Memory-mapped all-pairs ports x ports x modes matrix of distance and per tonne-km factors.
+
+The matrix lives in a .npy file that every process maps read-only, so the OS page
+cache holds a single copy shared by all workers and each lookup is one indexed read.
+A JSON sidecar records the port/mode axes and the source tables the cells were built
+from, which lets a rebuild rewrite only the cells whose port or leg changed.
+
+Usage:
+    python matrix.py build carbonix_matrix --port Tokyo --port Boston
+"""
+import argparse
+import json
+import os
+import numpy as np
+import tools
+
+# Same fallback the Carbon Calculator uses for unknown lanes and modes
+FALLBACK_DISTANCE_KM = 10000
+
+# Cell layout along the last axis: leg distance plus the factors resolved for that leg
+# (kept unmultiplied so pricing reproduces the calculator's arithmetic exactly)
+FIELDS = ('distance_km', 'emission_factor', 'cost_factor', 'time_factor')
+
+# Spare rows/columns reserved so new ports can be added without a full rebuild
+MIN_CAPACITY = 64
+
+
+def _paths(path):
+    return f"{path}.npy", f"{path}.json"
+
+
+def _leg_key(origin, destination):
+    return f"{origin}|{destination}"
+
+
+def _factor_snapshot():
+    return {
+        'EMISSION_FACTORS': dict(tools.EMISSION_FACTORS),
+        'COST_FACTORS': dict(tools.COST_FACTORS),
+        'TIME_FACTORS': dict(tools.TIME_FACTORS)
+    }
+
+
+def _cells(legs, origin, destination, modes):
+    """Matrix cells for one origin/destination pair, with the calculator's fallback rules."""
+    leg = legs.get(_leg_key(origin, destination))
+    cells = np.zeros((len(modes), len(FIELDS)))
+    for m, mode in enumerate(modes):
+        distance = leg.get(mode.replace('_slow', ''), FALLBACK_DISTANCE_KM) if leg else FALLBACK_DISTANCE_KM
+        cells[m] = (
+            distance,
+            tools.EMISSION_FACTORS.get(mode, 0.10),
+            tools.COST_FACTORS.get(mode, 0.10),
+            tools.TIME_FACTORS.get(mode, 2)
+        )
+    return cells
+
+
+def build_matrix(path, extra_ports=(), distances=None):
+    """
+    Build or incrementally update the matrix at path (.npy + .json sidecar).
+
+    Only pairs touching an added port or a changed leg are rewritten, in place, so
+    processes already mapping the file see the update. A change to the mode or factor
+    tables, or running out of spare capacity, triggers a full rebuild.
+
+    Returns:
+        Number of origin/destination pairs written
+    """
+    distances = tools.DISTANCES if distances is None else distances
+    legs = {_leg_key(o, d): dict(modes) for (o, d), modes in distances.items()}
+    modes = list(tools.EMISSION_FACTORS)
+    factors = _factor_snapshot()
+
+    ports = sorted({port for pair in distances for port in pair} | set(extra_ports))
+    npy_path, index_path = _paths(path)
+
+    index = None
+    if os.path.exists(npy_path) and os.path.exists(index_path):
+        with open(index_path) as f:
+            index = json.load(f)
+
+    incremental = (
+        index is not None
+        and index['modes'] == modes
+        and index['factors'] == factors
+        and len(set(index['ports']) | set(ports)) <= index['capacity']
+    )
+
+    if incremental:
+        # Keep existing port positions stable; new ports take the next free slots
+        ports = index['ports'] + [p for p in ports if p not in set(index['ports'])]
+        port_index = {p: i for i, p in enumerate(ports)}
+        old_legs = index['legs']
+        new_ports = set(ports[len(index['ports']):])
+        changed_legs = {k for k in set(legs) | set(old_legs) if legs.get(k) != old_legs.get(k)}
+        pairs = [
+            (o, d) for o in ports for d in ports
+            if o in new_ports or d in new_ports or _leg_key(o, d) in changed_legs
+        ]
+        matrix = np.load(npy_path, mmap_mode='r+')
+        capacity = index['capacity']
+    else:
+        port_index = {p: i for i, p in enumerate(ports)}
+        pairs = [(o, d) for o in ports for d in ports]
+        capacity = max(MIN_CAPACITY, 2 * len(ports))
+        tmp_path = f"{npy_path}.tmp"
+        matrix = np.lib.format.open_memmap(
+            tmp_path, mode='w+', dtype=np.float64, shape=(capacity, capacity, len(modes), len(FIELDS))
+        )
+
+    for origin, destination in pairs:
+        matrix[port_index[origin], port_index[destination]] = _cells(legs, origin, destination, modes)
+    matrix.flush()
+    del matrix
+
+    if not incremental:
+        os.replace(tmp_path, npy_path)
+
+    # Sidecar is swapped last so readers never see ports the matrix doesn't have yet
+    tmp_index = f"{index_path}.tmp"
+    with open(tmp_index, 'w') as f:
+        json.dump({'ports': ports, 'modes': modes, 'capacity': capacity, 'factors': factors, 'legs': legs}, f)
+    os.replace(tmp_index, index_path)
+
+    return len(pairs)
+
+
+class CostMatrix:
+    """Read-only, memory-mapped view of a built matrix with O(1) lookups."""
+
+    def __init__(self, path):
+        self.path = path
+        self._load()
+
+    def _stamp(self):
+        # Every build swaps in a new sidecar, so its inode/mtime change on any rebuild
+        stat = os.stat(_paths(self.path)[1])
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _load(self):
+        npy_path, index_path = _paths(self.path)
+        stamp = self._stamp()
+        with open(index_path) as f:
+            index = json.load(f)
+        self._index_stamp = stamp
+        self.matrix = np.load(npy_path, mmap_mode='r')
+        self.port_index = {p: i for i, p in enumerate(index['ports'])}
+        self.mode_index = {m: i for i, m in enumerate(index['modes'])}
+
+    def refresh(self):
+        """
+        Remap if the matrix was rebuilt since it was opened. A full rebuild replaces the
+        .npy, which an existing mapping would otherwise keep reading from the old file.
+
+        Returns:
+            True if the matrix was reloaded
+        """
+        if self._stamp() == self._index_stamp:
+            return False
+        self._load()
+        return True
+
+    def _port(self, port):
+        i = self.port_index.get(port)
+        if i is None and self.refresh():
+            # Picked up ports added by a build since we opened the file
+            i = self.port_index.get(port)
+        return i
+
+    def lookup(self, origin, destination, mode):
+        """
+        Distance and per tonne-km factors for one leg.
+
+        Returns:
+            Dictionary keyed by FIELDS (unknown ports/modes use the calculator fallback)
+        """
+        o, d, m = self._port(origin), self._port(destination), self.mode_index.get(mode)
+        if o is None or d is None or m is None:
+            cells = _cells({}, origin, destination, [mode])[0]
+        else:
+            cells = self.matrix[o, d, m]
+        return dict(zip(FIELDS, (float(v) for v in cells)))
+
+    def calculate_carbon(self, origin, destination, weight, mode, carbon_tax_rate=100):
+        """Matrix-backed equivalent of CarbonCalculatorTool._run."""
+        cell = self.lookup(origin, destination, mode)
+        distance = cell['distance_km']
+        total_emissions = (distance * weight * cell['emission_factor']) / 1000
+        base_cost = distance * weight * cell['cost_factor']
+        carbon_tax = total_emissions * carbon_tax_rate
+        transit_days = (distance / 1000) * cell['time_factor']
+
+        return {
+            'mode': mode,
+            'distance_km': int(distance),
+            'emissions_tonnes': round(total_emissions, 2),
+            'base_cost_usd': round(base_cost, 2),
+            'carbon_tax_usd': round(carbon_tax, 2),
+            'total_cost_usd': round(base_cost + carbon_tax, 2),
+            'transit_days': round(transit_days, 1)
+        }
+
+    def compare_routes(self, origin, destination, weight, carbon_tax_rate=100, *, modes=('sea', 'sea_slow', 'rail')):
+        """Matrix-backed equivalent of RouteCompareTool._run (same positional signature)."""
+        return [self.calculate_carbon(origin, destination, weight, mode, carbon_tax_rate) for mode in modes]
+
+
+_open_matrices = {}
+
+
+def open_matrix(path):
+    """Per-process cached CostMatrix, so each worker maps the file once."""
+    if path not in _open_matrices:
+        _open_matrices[path] = CostMatrix(path)
+    return _open_matrices[path]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the shared Carbonix cost matrix")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help="Build or incrementally update the matrix")
+    build.add_argument('path', help="Output path without extension")
+    build.add_argument('--port', action='append', default=[], help="Extra port to include (repeatable)")
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        written = build_matrix(args.path, extra_ports=args.port)
+        print(f"{written} port pairs written to {args.path}.npy")
+
+
+if __name__ == '__main__':
+    main()
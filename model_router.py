@@ -0,0 +1,121 @@
+import os
+import threading
+
+# Model per tier; override via environment
+FAST_MODEL = os.getenv('CARBONIX_FAST_MODEL', 'gpt-4o-mini')
+FULL_MODEL = os.getenv('CARBONIX_FULL_MODEL', 'gpt-4o')
+
+# Relative gap between the best and runner-up trilemma scores
+CLEAR_MARGIN = 0.25  # at or above: one mode clearly dominates
+CLOSE_MARGIN = 0.04  # below: a close call that needs the full model
+# Hand-tuned on the four demo lanes at the dashboard default (100 t, balanced):
+# Mumbai-Hamburg spreads 2.2% (full), Dubai-Amsterdam 5.0% and Singapore-London 5.8%
+# (fast), Shanghai-Rotterdam 46.6% but goes full on congestion. Re-check both
+# margins against real request mixes before relying on the split.
+
+# Average port congestion (0-10) thresholds
+TEMPLATE_MAX_CONGESTION = 6  # template narration only on stable routes
+ESCALATE_CONGESTION = 7      # high congestion always goes to the full model
+
+TIERS = ('template', 'fast', 'full')
+
+
+def score_spread(optimal_decision):
+    """Relative margin of the winning trilemma score over the runner-up."""
+    scores = sorted(optimal_decision['all_scores'].values())
+    if len(scores) < 2 or scores[0] <= 0:
+        return float('inf')
+    return round((scores[1] - scores[0]) / scores[0], 4)
+
+
+def choose_tier(optimal_decision, origin_congestion, dest_congestion):
+    """
+    Pick how much model the crew needs for this decision.
+
+    Returns:
+        (tier, score spread) where tier is 'template', 'fast' or 'full'
+    """
+    spread = score_spread(optimal_decision)
+    avg_congestion = (origin_congestion['congestion_level'] + dest_congestion['congestion_level']) / 2
+
+    if avg_congestion > ESCALATE_CONGESTION or spread < CLOSE_MARGIN:
+        return 'full', spread
+    if spread >= CLEAR_MARGIN and avg_congestion <= TEMPLATE_MAX_CONGESTION:
+        return 'template', spread
+    return 'fast', spread
+
+
+def tier_model(tier):
+    """LLM for a crew tier (template runs no model)."""
+    return {'fast': FAST_MODEL, 'full': FULL_MODEL}.get(tier)
+
+
+def template_narration(origin, dest, weight, route_data, origin_congestion, dest_congestion, optimal_decision):
+    """Deterministic write-up in the three agents' voices for clear-cut decisions."""
+    greenest = min(route_data, key=lambda r: r['emissions_tonnes'])
+    cheapest = min(route_data, key=lambda r: r['total_cost_usd'])
+    fastest = min(route_data, key=lambda r: r['transit_days'])
+    baseline = route_data[0]
+    savings_pct = (baseline['emissions_tonnes'] - greenest['emissions_tonnes']) / baseline['emissions_tonnes'] * 100
+
+    avg_congestion = (origin_congestion['congestion_level'] + dest_congestion['congestion_level']) / 2
+    risk_rating = "LOW" if avg_congestion <= 4 else "MODERATE" if avg_congestion <= 7 else "HIGH"
+
+    selected = optimal_decision['selected_mode'].replace('_', ' ').upper()
+    reasons = "\n".join(f"- {reason}" for reason in optimal_decision['reasoning'])
+
+    return f"""### Carbon Emission Specialist
+Greenest option for {weight} tonnes {origin} → {dest} is **{greenest['mode']}** at {greenest['emissions_tonnes']} t CO₂ \
+({savings_pct:.1f}% below standard sea), carbon tax ${greenest['carbon_tax_usd']:,.0f}.
+
+### Commercial Logistics Lead
+Lowest total cost is **{cheapest['mode']}** at ${cheapest['total_cost_usd']:,.0f}; fastest is **{fastest['mode']}** \
+at {fastest['transit_days']} days.
+
+### Supply Chain Risk Manager
+{origin_congestion['port']}: {origin_congestion['status']} congestion ({origin_congestion['congestion_level']}/10, \
+~{origin_congestion['estimated_delay_days']} days delay). {dest_congestion['port']}: {dest_congestion['status']} congestion \
+({dest_congestion['congestion_level']}/10, ~{dest_congestion['estimated_delay_days']} days delay).
+**RISK RATING: {risk_rating}**
+
+### Decision: {selected}
+{reasons}
+
+_Clear-cut decision (trilemma margin {score_spread(optimal_decision):.0%}) - narrated from template without an LLM call._"""
+
+
+class TierMetrics:
+    """Thread-safe running latency/token totals per routing tier."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {tier: {'runs': 0, 'latency_s': 0.0, 'tokens': 0} for tier in TIERS}
+
+    def record(self, tier, latency_s, tokens):
+        with self._lock:
+            totals = self._totals[tier]
+            totals['runs'] += 1
+            totals['latency_s'] += latency_s
+            totals['tokens'] += tokens
+
+    def report(self):
+        """Per-tier share of runs, average latency and average tokens."""
+        with self._lock:
+            total_runs = sum(t['runs'] for t in self._totals.values())
+            return {
+                tier: {
+                    'runs': t['runs'],
+                    'share': round(t['runs'] / total_runs, 3) if total_runs else 0.0,
+                    'avg_latency_s': round(t['latency_s'] / t['runs'], 3) if t['runs'] else 0.0,
+                    'avg_tokens': round(t['tokens'] / t['runs'], 1) if t['runs'] else 0.0
+                }
+                for tier, t in self._totals.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            for totals in self._totals.values():
+                totals.update(runs=0, latency_s=0.0, tokens=0)
+
+
+tier_metrics = TierMetrics()
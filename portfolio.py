@@ -0,0 +1,212 @@
+"""
+Carbon-capped mode allocation across a portfolio of shipments.
+
+Usage:
+    python portfolio.py shipments.csv --cap 5000 [--tax 140]
+
+The CSV uses the batch manifest columns (origin, destination, weight) plus an
+optional deadline_days.
+"""
+import argparse
+import csv
+import json
+
+import numpy as np
+from tools import LogisticsTools
+
+# Modes offered by RouteCompareTool, in the order it returns them
+PORTFOLIO_MODES = ['sea', 'sea_slow', 'rail']
+
+# Lane options are priced once at this weight and scaled linearly per shipment
+REFERENCE_WEIGHT = 1000.0
+
+
+def _lane_options(lanes, carbon_tax_rate=100):
+    """
+    Price every unique lane once with the Route Comparer.
+    Returns per-tonne emissions/cost arrays and transit days, shape (lanes, modes).
+    """
+    n_lanes, n_modes = len(lanes), len(PORTFOLIO_MODES)
+    emissions = np.zeros((n_lanes, n_modes))
+    cost = np.zeros((n_lanes, n_modes))
+    transit = np.zeros((n_lanes, n_modes))
+
+    for i, (origin, destination) in enumerate(lanes):
+        options = {r['mode']: r for r in LogisticsTools.compare_routes(origin, destination, REFERENCE_WEIGHT, carbon_tax_rate)}
+        for j, mode in enumerate(PORTFOLIO_MODES):
+            emissions[i, j] = options[mode]['emissions_tonnes'] / REFERENCE_WEIGHT
+            cost[i, j] = options[mode]['total_cost_usd'] / REFERENCE_WEIGHT
+            transit[i, j] = options[mode]['transit_days']
+
+    return emissions, cost, transit
+
+
+def _abatement_steps(emissions, cost, start):
+    """
+    Walk each shipment's lower convex hull from its starting mode towards lower emissions.
+    Every step is an (abated tonnes, extra cost) move to a greener mode; along a hull the
+    marginal cost per tonne never decreases, so sorting all steps globally by marginal
+    cost gives the greedy (LP-relaxation) abatement order.
+    """
+    n = emissions.shape[0]
+    rows = np.arange(n)
+    current = start.copy()
+    steps = []
+
+    for k in range(emissions.shape[1] - 1):
+        cur_e = emissions[rows, current][:, None]
+        cur_c = cost[rows, current][:, None]
+        abated = cur_e - emissions
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = np.where(abated > 1e-12, (cost - cur_c) / abated, np.inf)
+        target = np.argmin(slope, axis=1)
+        best = slope[rows, target]
+        has_step = np.isfinite(best)
+        if not has_step.any():
+            break
+
+        idx = rows[has_step]
+        steps.append((
+            idx,
+            np.full(idx.size, k),
+            target[has_step],
+            abated[idx, target[has_step]],
+            best[has_step],
+        ))
+        current = np.where(has_step, target, current)
+
+    if not steps:
+        empty = np.array([], dtype=int)
+        return empty, empty, empty, np.array([]), np.array([])
+    return tuple(np.concatenate(parts) for parts in zip(*steps))
+
+
+def optimize_portfolio(shipments, carbon_cap, carbon_tax_rate=100):
+    """
+    Allocate transport modes across a portfolio of shipments so that total emissions
+    stay under carbon_cap (tonnes CO2) at minimum total cost, respecting deadlines.
+
+    Each shipment is a dict with origin, destination, weight and an optional
+    deadline_days. Costs include carbon tax at carbon_tax_rate ($/tonne CO2). Shipments
+    start on their cheapest on-time mode and are moved to greener modes in order of
+    marginal abatement cost until the cap is met.
+
+    Returns:
+        Dictionary with per-shipment modes, portfolio totals, the carbon shadow price
+        and the abatement cost curve.
+    """
+    shipments = list(shipments)
+    n = len(shipments)
+
+    # Index shipments by lane so each lane is priced only once
+    lane_index = {}
+    lane_ids = np.empty(n, dtype=np.int64)
+    weights = np.empty(n)
+    deadlines = np.full(n, np.inf)
+    for i, shipment in enumerate(shipments):
+        lane = (shipment['origin'], shipment['destination'])
+        lane_ids[i] = lane_index.setdefault(lane, len(lane_index))
+        weights[i] = shipment['weight']
+        if shipment.get('deadline_days') is not None:
+            deadlines[i] = shipment['deadline_days']
+
+    lane_emissions, lane_cost, lane_transit = _lane_options(list(lane_index), carbon_tax_rate)
+    emissions = lane_emissions[lane_ids] * weights[:, None]
+    cost = lane_cost[lane_ids] * weights[:, None]
+    transit = lane_transit[lane_ids]
+
+    # Modes that miss the deadline are priced out; shipments with no on-time mode take the fastest
+    on_time = transit <= deadlines[:, None]
+    late = ~on_time.any(axis=1)
+    on_time[late, np.argmin(transit[late], axis=1)] = True
+    cost = np.where(on_time, cost, np.inf)
+    emissions = np.where(on_time, emissions, np.inf)
+
+    rows = np.arange(n)
+    start = np.argmin(cost, axis=1)
+    baseline_emissions = emissions[rows, start].sum()
+    baseline_cost = cost[rows, start].sum()
+
+    # Greedy marginal-abatement: take the cheapest steps until the cap is met
+    step_ship, step_k, step_target, step_abated, step_slope = _abatement_steps(emissions, cost, start)
+    order = np.lexsort((step_k, step_slope))
+    step_ship, step_k, step_target = step_ship[order], step_k[order], step_target[order]
+    step_abated, step_slope = step_abated[order], step_slope[order]
+
+    cumulative_abated = np.cumsum(step_abated)
+    cumulative_cost = np.cumsum(step_abated * step_slope)
+    required = baseline_emissions - carbon_cap
+    if required <= 0:
+        n_steps = 0
+    else:
+        n_steps = min(int(np.searchsorted(cumulative_abated, required - 1e-9)) + 1, step_abated.size)
+
+    # Final mode is the target of the furthest hull step applied to each shipment
+    targets = np.full((n, max(len(PORTFOLIO_MODES) - 1, 1)), -1, dtype=np.int64)
+    targets[step_ship, step_k] = step_target
+    applied_k = np.full(n, -1, dtype=np.int64)
+    np.maximum.at(applied_k, step_ship[:n_steps], step_k[:n_steps])
+    final = np.where(applied_k >= 0, targets[rows, np.maximum(applied_k, 0)], start)
+
+    total_emissions = emissions[rows, final].sum()
+    total_cost = cost[rows, final].sum()
+    modes = np.array(PORTFOLIO_MODES)[final]
+
+    return {
+        'assigned_modes': modes.tolist(),
+        'mode_counts': {mode: int((modes == mode).sum()) for mode in PORTFOLIO_MODES},
+        'total_emissions_tonnes': round(float(total_emissions), 2),
+        'total_cost_usd': round(float(total_cost), 2),
+        'baseline_emissions_tonnes': round(float(baseline_emissions), 2),
+        'baseline_cost_usd': round(float(baseline_cost), 2),
+        'carbon_cap_tonnes': carbon_cap,
+        'carbon_tax_rate': carbon_tax_rate,
+        'cap_met': bool(total_emissions <= carbon_cap + 1e-6),
+        'late_shipments': int(late.sum()),
+        'shadow_price_usd_per_tonne': round(float(step_slope[n_steps - 1]), 2) if n_steps else 0.0,
+        'abatement_curve': {
+            'abated_tonnes': cumulative_abated.round(2).tolist(),
+            'marginal_cost_usd_per_tonne': step_slope.round(2).tolist(),
+            'cumulative_cost_usd': cumulative_cost.round(2).tolist(),
+        },
+    }
+
+
+def load_shipments(path):
+    """Read a shipment CSV (origin, destination, weight[, deadline_days])."""
+    with open(path, newline='') as f:
+        return [
+            {
+                'origin': row['origin'],
+                'destination': row['destination'],
+                'weight': float(row['weight']),
+                'deadline_days': float(row['deadline_days']) if row.get('deadline_days') else None
+            }
+            for row in csv.DictReader(f)
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Allocate modes across a shipment portfolio under a carbon cap")
+    parser.add_argument('shipments', help="CSV with origin, destination, weight and optional deadline_days")
+    parser.add_argument('--cap', type=float, required=True, help="Portfolio carbon cap (tonnes CO2)")
+    parser.add_argument('--tax', type=float, default=100, help="Carbon tax (USD per tonne CO2)")
+    parser.add_argument('--json', action='store_true', help="Print the full result as JSON")
+    args = parser.parse_args()
+
+    result = optimize_portfolio(load_shipments(args.shipments), args.cap, args.tax)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"Cap {'met' if result['cap_met'] else 'NOT met'}: {result['total_emissions_tonnes']:,} t CO2 "
+          f"(baseline {result['baseline_emissions_tonnes']:,} t, cap {args.cap:,} t)")
+    print(f"Total cost ${result['total_cost_usd']:,.2f} (baseline ${result['baseline_cost_usd']:,.2f}), "
+          f"shadow price ${result['shadow_price_usd_per_tonne']:,.2f}/t")
+    print("Modes: " + ", ".join(f"{mode}={n}" for mode, n in result['mode_counts'].items()))
+    if result['late_shipments']:
+        print(f"{result['late_shipments']} shipment(s) cannot meet their deadline on any mode")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+import math
+import zlib
+from datetime import date, timedelta
+import numpy as np
+from tools import LogisticsTools
+
+# Modes that berth at the origin/destination ports and therefore queue behind congestion
+PORT_MODES = {'sea', 'sea_slow'}
+
+# Terminal dwell before departure and after arrival (days)
+DWELL_DAYS = {
+    'sea': 1.0,
+    'sea_slow': 1.0,
+    'rail': 0.5,
+    'air': 0.2,
+    'road': 0.1
+}
+
+# Holding/demurrage cost while cargo sits in port or terminal (USD per tonne per day)
+DELAY_COST_PER_TONNE_DAY = 2.0
+
+# Delivery deadline the dashboard's departure planner starts from (days from today)
+DEFAULT_DEADLINE_DAYS = 60
+
+# Congestion swings around the checker's baseline on a monthly cycle plus a weekly peak
+CONGESTION_CYCLE_DAYS = 28
+CONGESTION_CYCLE_AMPLITUDE = 0.3
+WEEKLY_AMPLITUDE = 0.15
+
+
+def congestion_profile(port_name, start_date, days):
+    """
+    Expected port delay (days) for each departure day in [start_date, start_date + days).
+    Anchored on the Port Congestion Checker's estimate, with a port-specific phase so
+    the profile is reproducible for any calendar window.
+    """
+    base = LogisticsTools.get_port_congestion(port_name)['estimated_delay_days']
+    phase = zlib.crc32(port_name.encode()) % CONGESTION_CYCLE_DAYS
+    ordinals = start_date.toordinal() + np.arange(days)
+
+    cycle = np.sin(2 * np.pi * (ordinals + phase) / CONGESTION_CYCLE_DAYS)
+    weekly = np.cos(2 * np.pi * (ordinals % 7) / 7)
+    return np.maximum(base * (1 + CONGESTION_CYCLE_AMPLITUDE * cycle + WEEKLY_AMPLITUDE * weekly), 0)
+
+
+def departure_table(lanes, weight, modes=('sea', 'sea_slow', 'rail'), start_date=None, horizon_days=30,
+                    carbon_tax_rate=100):
+    """
+    Price every departure day in the horizon for every lane and mode in one batched pass.
+
+    Each (lane, mode, departure day) is a departure arc in a time-expanded network:
+    origin dwell and congestion, line-haul transit, then destination congestion looked up
+    on the day the cargo actually reaches the port.
+
+    Returns:
+        Dictionary of (lanes, modes, days) arrays plus the axis labels
+    """
+    start_date = start_date or date.today()
+    lanes = list(lanes)
+    modes = list(modes)
+
+    # Static per-mode transit and cost from the calculator
+    transit = np.zeros((len(lanes), len(modes)))
+    base_cost = np.zeros((len(lanes), len(modes)))
+    for i, (origin, destination) in enumerate(lanes):
+        for j, mode in enumerate(modes):
+            route = LogisticsTools.calculate_carbon(origin, destination, weight, mode, carbon_tax_rate)
+            transit[i, j] = route['transit_days']
+            base_cost[i, j] = route['total_cost_usd']
+
+    # Time-indexed congestion per port, long enough to cover the latest possible arrival
+    ports = sorted({port for lane in lanes for port in lane})
+    port_index = {port: k for k, port in enumerate(ports)}
+    # (port delay stays well under one congestion cycle, so a cycle of slack covers it)
+    span = horizon_days + math.ceil(transit.max(initial=0) + max(DWELL_DAYS.values())) + CONGESTION_CYCLE_DAYS
+    profiles = np.stack([congestion_profile(port, start_date, span) for port in ports])
+
+    origin_idx = np.array([port_index[o] for o, _ in lanes])[:, None, None]
+    dest_idx = np.array([port_index[d] for _, d in lanes])[:, None, None]
+    queues = np.array([mode in PORT_MODES for mode in modes])[None, :, None]
+    dwell = np.array([DWELL_DAYS.get(mode, 1.0) for mode in modes])[None, :, None]
+    departures = np.arange(horizon_days)[None, None, :]
+
+    origin_delay = np.where(queues, profiles[origin_idx, departures], 0) + dwell
+    at_destination = departures + origin_delay + transit[:, :, None]
+    dest_day = np.minimum(np.floor(at_destination).astype(int), span - 1)
+    dest_delay = np.where(queues, profiles[dest_idx, dest_day], 0) + dwell
+
+    arrival = at_destination + dest_delay
+    cost = base_cost[:, :, None] + (origin_delay + dest_delay) * DELAY_COST_PER_TONNE_DAY * weight
+
+    return {
+        'lanes': lanes,
+        'modes': modes,
+        'departure_dates': [start_date + timedelta(days=d) for d in range(horizon_days)],
+        'arrival_day': arrival,
+        'port_delay_days': origin_delay + dest_delay - 2 * dwell,
+        'cost_usd': cost,
+    }
+
+
+def earliest_arrival_labels(arrival_day):
+    """
+    Label-setting sweep over the wait arcs of the time-expanded network.
+    For cargo ready on day d, the earliest arrival is the best departure on any day >= d,
+    so labels are settled backwards in time with a running minimum.
+
+    Returns:
+        (earliest arrival, departure day achieving it), both indexed by ready day
+    """
+    reversed_arrival = arrival_day[..., ::-1]
+    labels = np.minimum.accumulate(reversed_arrival, axis=-1)[..., ::-1]
+
+    # Track the departure that set each label: last index where the running minimum improved
+    days = arrival_day.shape[-1]
+    improved = reversed_arrival <= labels[..., ::-1]
+    setter = np.where(improved, np.arange(days), 0)
+    departure = (days - 1) - np.maximum.accumulate(setter, axis=-1)[..., ::-1]
+    return labels, departure
+
+
+def best_departures(lanes, weight, deadline_days=None, modes=('sea', 'sea_slow', 'rail'),
+                    start_date=None, horizon_days=30, carbon_tax_rate=100):
+    """
+    Answer "best departure in the next N days" for every lane and mode at once.
+
+    Returns:
+        List of dicts with the earliest-arrival departure and, if a deadline (days from
+        start_date) is given, the cheapest departure that still arrives on time.
+    """
+    lanes = list(lanes)
+    if not lanes:
+        return []
+
+    start_date = start_date or date.today()
+    table = departure_table(lanes, weight, modes, start_date, horizon_days, carbon_tax_rate)
+    arrival = table['arrival_day']
+    cost = table['cost_usd']
+
+    labels, label_departure = earliest_arrival_labels(arrival)
+    fastest_dep = label_departure[..., 0]
+
+    if deadline_days is not None:
+        on_time_cost = np.where(arrival <= deadline_days, cost, np.inf)
+        cheapest_dep = np.argmin(on_time_cost, axis=-1)
+        cheapest_cost = np.take_along_axis(on_time_cost, cheapest_dep[..., None], axis=-1)[..., 0]
+
+    results = []
+    for i, (origin, destination) in enumerate(table['lanes']):
+        for j, mode in enumerate(table['modes']):
+            d = fastest_dep[i, j]
+            result = {
+                'origin': origin,
+                'destination': destination,
+                'mode': mode,
+                'earliest_departure': table['departure_dates'][d].isoformat(),
+                'earliest_arrival': (start_date + timedelta(days=float(labels[i, j, 0]))).isoformat(),
+                'transit_days': round(float(arrival[i, j, d] - d), 1),
+                'port_delay_days': round(float(table['port_delay_days'][i, j, d]), 1),
+                'total_cost_usd': round(float(cost[i, j, d]), 2),
+            }
+            if deadline_days is not None:
+                on_time = np.isfinite(cheapest_cost[i, j])
+                c = cheapest_dep[i, j]
+                result['cheapest_on_time_departure'] = table['departure_dates'][c].isoformat() if on_time else None
+                result['cheapest_on_time_cost_usd'] = round(float(cheapest_cost[i, j]), 2) if on_time else None
+            results.append(result)
+
+    return results
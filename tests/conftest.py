@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Modules live at the repo root; agents.py builds its crew on import, which needs a key
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+os.environ.setdefault('CREWAI_DISABLE_TELEMETRY', 'true')
+os.environ.setdefault('OTEL_SDK_DISABLED', 'true')
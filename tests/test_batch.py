@@ -0,0 +1,162 @@
+import csv
+import os
+import subprocess
+import sys
+
+import pytest
+
+import batch
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROWS = [
+    {'shipment_id': 'a', 'origin': 'Shanghai', 'destination': 'Rotterdam', 'weight': '100'},
+    {'shipment_id': 'b', 'origin': 'Mumbai', 'destination': 'Hamburg', 'weight': '250'},
+    {'shipment_id': 'c', 'origin': 'Dubai', 'destination': 'Amsterdam', 'weight': '40'}
+]
+
+
+@pytest.fixture
+def queue(tmp_path):
+    manifest = tmp_path / 'manifest.csv'
+    with open(manifest, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(ROWS[0]))
+        writer.writeheader()
+        writer.writerows(ROWS)
+
+    queue_path = str(tmp_path / 'queue.db')
+    job_id, n_shards = batch.submit_manifest(queue_path, str(manifest), shard_size=2)
+    assert n_shards == 2
+
+    conn = batch.connect(queue_path)
+    yield queue_path, conn, job_id
+    conn.close()
+
+
+def _shard(conn, job_id, shard):
+    return conn.execute(
+        "SELECT status, attempts, worker, error FROM shards WHERE job_id = ? AND shard = ?", (job_id, shard)
+    ).fetchone()
+
+
+def _read_partition(path):
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def test_claim_leases_shards_in_order(queue):
+    _, conn, job_id = queue
+
+    first = batch.claim_shard(conn, 'w1')
+    second = batch.claim_shard(conn, 'w2')
+
+    assert first[:2] == (job_id, 0)
+    assert second[:2] == (job_id, 1)
+    assert [row['shipment_id'] for row in first[2]] == ['a', 'b']
+    assert batch.claim_shard(conn, 'w3') is None
+
+
+def test_expired_lease_is_reclaimed(queue):
+    _, conn, job_id = queue
+
+    batch.claim_shard(conn, 'w1', lease_seconds=-1)
+    reclaimed = batch.claim_shard(conn, 'w2')
+
+    assert reclaimed[:2] == (job_id, 0)
+    assert _shard(conn, job_id, 0)[:3] == ('running', 2, 'w2')
+
+    # The original worker lost its lease; its late result must not land
+    batch.finish_shard(conn, job_id, 0, 'w1')
+    assert _shard(conn, job_id, 0)[0] == 'running'
+    batch.finish_shard(conn, job_id, 0, 'w2')
+    assert _shard(conn, job_id, 0)[0] == 'done'
+
+
+def test_errors_retry_until_max_attempts(queue):
+    _, conn, job_id = queue
+
+    for attempt in range(1, 3):
+        assert batch.claim_shard(conn, 'w1', max_attempts=2)[:2] == (job_id, 0)
+        batch.finish_shard(conn, job_id, 0, 'w1', error='boom', max_attempts=2)
+        assert _shard(conn, job_id, 0)[:2] == ('pending' if attempt < 2 else 'failed', attempt)
+
+    assert _shard(conn, job_id, 0)[3] == 'boom'
+    assert batch.claim_shard(conn, 'w1', max_attempts=2)[:2] == (job_id, 1)
+
+
+def test_expired_lease_on_last_attempt_fails(queue):
+    _, conn, job_id = queue
+
+    batch.claim_shard(conn, 'w1', lease_seconds=-1, max_attempts=1)
+    batch.claim_shard(conn, 'w2', max_attempts=1)
+
+    assert _shard(conn, job_id, 0)[0] == 'failed'
+    assert _shard(conn, job_id, 0)[3] == 'lease expired'
+
+
+def test_rerun_shard_rewrites_partition(queue, tmp_path):
+    queue_path, conn, job_id = queue
+    out_dir = str(tmp_path / 'priced')
+
+    assert batch.run_worker(queue_path, out_dir) == 2
+    path = os.path.join(out_dir, f"job={job_id}", 'part-00000.csv')
+    first = _read_partition(path)
+
+    # Re-queue a finished shard, as a lost lease would, and price it again
+    conn.execute("UPDATE shards SET status = 'pending' WHERE job_id = ? AND shard = 0", (job_id,))
+    assert batch.run_worker(queue_path, out_dir) == 1
+
+    assert _read_partition(path) == first
+    assert sorted(os.listdir(os.path.dirname(path))) == ['part-00000.csv', 'part-00001.csv']
+    assert batch.queue_status(queue_path) == {job_id: {'done': 2}}
+
+
+def test_bad_row_is_recorded_not_fatal():
+    rows = ROWS + [{'shipment_id': 'd', 'origin': 'Tokyo', 'destination': 'Boston', 'weight': 'n/a'}]
+
+    priced = batch.price_rows(rows)
+
+    assert [row['shipment_id'] for row in priced] == ['a', 'b', 'c', 'd']
+    assert all(row['error'] == '' for row in priced[:3])
+    assert priced[3]['error'].startswith('ValueError')
+    assert 'selected_mode' not in priced[3]
+
+
+def test_queue_uses_rollback_journal_unless_wal_requested(queue, tmp_path):
+    _, conn, _ = queue
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'delete'
+
+    manifest = tmp_path / 'manifest.csv'
+    wal_queue = str(tmp_path / 'wal.db')
+    batch.submit_manifest(wal_queue, str(manifest), wal=True)
+    wal_conn = batch.connect(wal_queue)
+    assert wal_conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+    wal_conn.close()
+
+
+def test_two_worker_processes_price_each_shard_once(tmp_path):
+    manifest = tmp_path / 'manifest.csv'
+    rows = [dict(row, shipment_id=f"{row['shipment_id']}{n}") for n in range(20) for row in ROWS]
+    with open(manifest, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(ROWS[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    queue_path = str(tmp_path / 'queue.db')
+    out_dir = str(tmp_path / 'priced')
+    job_id, n_shards = batch.submit_manifest(queue_path, str(manifest), shard_size=5)
+
+    subprocess.run(
+        [sys.executable, 'batch.py', 'work', '--queue', queue_path, '--out', out_dir, '--processes', '2'],
+        cwd=REPO_ROOT, check=True, capture_output=True
+    )
+
+    conn = batch.connect(queue_path)
+    shards = conn.execute("SELECT status, attempts, COUNT(*) FROM shards GROUP BY status, attempts").fetchall()
+    conn.close()
+    assert shards == [('done', 1, n_shards)]
+
+    job_dir = os.path.join(out_dir, f"job={job_id}")
+    assert sorted(os.listdir(job_dir)) == [f"part-{n:05d}.csv" for n in range(n_shards)]
+    priced = [row['shipment_id'] for name in os.listdir(job_dir) for row in _read_partition(os.path.join(job_dir, name))]
+    assert sorted(priced) == sorted(row['shipment_id'] for row in rows)
@@ -0,0 +1,55 @@
+import pytest
+
+import decision_table
+import tools
+
+LANE = ('Shanghai', 'Rotterdam')
+
+
+@pytest.fixture
+def table_path(tmp_path):
+    path = str(tmp_path / 'decision_table.json')
+    decision_table.build_decision_table(path, [LANE])
+    return path
+
+
+@pytest.fixture
+def restore_factors():
+    saved = dict(tools.EMISSION_FACTORS)
+    yield
+    tools.EMISSION_FACTORS.clear()
+    tools.EMISSION_FACTORS.update(saved)
+
+
+def test_hit_matches_live_and_is_a_private_copy(table_path):
+    hit = decision_table.lookup_decision(*LANE, 100, 140, path=table_path)
+
+    assert hit == decision_table.compute_decision(*LANE, 100, 140)
+    hit['route_comparison'].clear()
+    assert len(decision_table.lookup_decision(*LANE, 100, 140, path=table_path)['route_comparison']) == 3
+
+
+def test_only_exact_bucket_values_hit(table_path):
+    assert decision_table.lookup_decision(*LANE, 1000, 100, path=table_path) is not None
+    assert decision_table.lookup_decision(*LANE, 1000.004, 100, path=table_path) is None
+    assert decision_table.lookup_decision(*LANE, 100, 120, path=table_path) is None
+    assert decision_table.lookup_decision(*LANE, 100, 100, {'cost': 0.5, 'carbon': 0.5, 'time': 0}, path=table_path) is None
+
+
+def test_factor_change_misses_until_restored(table_path, restore_factors):
+    assert decision_table.lookup_decision(*LANE, 100, 100, path=table_path) is not None
+
+    tools.EMISSION_FACTORS['sea'] = 0.02
+    assert decision_table.lookup_decision(*LANE, 100, 100, path=table_path) is None
+
+    tools.EMISSION_FACTORS['sea'] = 0.015
+    assert decision_table.lookup_decision(*LANE, 100, 100, path=table_path) is not None
+
+
+def test_missing_table_is_built_on_first_use(tmp_path):
+    path = str(tmp_path / 'fresh.json')
+
+    analysis, source = decision_table.get_decision(*LANE, 100, 100, path=path)
+
+    assert source == 'table'
+    assert analysis == decision_table.compute_decision(*LANE, 100, 100)
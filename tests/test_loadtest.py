@@ -0,0 +1,23 @@
+from loadtest import SwarmSession, StubLLM, run_load_test
+
+
+def test_concurrent_sessions_run_without_errors():
+    # Two concurrent users is enough to hit shared-agent races like
+    # "Executor is already running"
+    report = run_load_test(stages=(1, 2), stage_seconds=1, llm_latency_ms=5)
+
+    assert [stage['users'] for stage in report['stages']] == [1, 2]
+    for stage in report['stages']:
+        assert stage['errors'] == 0, stage['error_samples']
+        assert stage['sessions'] > 0
+
+
+def test_session_tab_data_uses_session_tax():
+    session = SwarmSession(StubLLM(model='stub', latency_s=0, jitter_s=0), compact=True)
+    session.session_state['carbon_tax_input'] = 140
+
+    session.deploy('Shanghai', 'Rotterdam', 100)
+    routes, departures = session.tab_data()
+
+    assert session.session_state['agent_result']['carbon_tax_rate'] == 140
+    assert len(routes) == len(departures) == 3
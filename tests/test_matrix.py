@@ -0,0 +1,103 @@
+import os
+
+import numpy as np
+import pytest
+
+import matrix
+import tools
+from tools import LogisticsTools
+
+DISTANCES = {
+    ('Shanghai', 'Rotterdam'): {'sea': 20000, 'rail': 11000},
+    ('Mumbai', 'Hamburg'): {'sea': 8500, 'rail': 7000}
+}
+
+
+@pytest.fixture
+def matrix_path(tmp_path):
+    path = str(tmp_path / 'costs')
+    matrix.build_matrix(path, distances=DISTANCES)
+    return path
+
+
+@pytest.fixture
+def restore_factors():
+    saved = dict(tools.EMISSION_FACTORS)
+    yield
+    tools.EMISSION_FACTORS.clear()
+    tools.EMISSION_FACTORS.update(saved)
+
+
+def _npy_inode(path):
+    return os.stat(f"{path}.npy").st_ino
+
+
+def test_matrix_matches_live_calculator(matrix_path):
+    cm = matrix.CostMatrix(matrix_path)
+
+    for origin, destination in list(DISTANCES) + [('Tokyo', 'Boston')]:
+        for tax in (100, 140):
+            assert cm.compare_routes(origin, destination, 250.0, tax) == \
+                LogisticsTools.compare_routes(origin, destination, 250.0, tax)
+
+
+def test_compare_routes_modes_is_keyword_only(matrix_path):
+    cm = matrix.CostMatrix(matrix_path)
+
+    routes = cm.compare_routes('Shanghai', 'Rotterdam', 100.0, modes=('rail',))
+
+    assert [r['mode'] for r in routes] == ['rail']
+    with pytest.raises(TypeError):
+        cm.compare_routes('Shanghai', 'Rotterdam', 100.0, 100, ('rail',))
+
+
+def test_changed_leg_is_rewritten_in_place(matrix_path):
+    cm = matrix.CostMatrix(matrix_path)
+    inode = _npy_inode(matrix_path)
+
+    changed = dict(DISTANCES)
+    changed[('Mumbai', 'Hamburg')] = {'sea': 9000, 'rail': 7000}
+    written = matrix.build_matrix(matrix_path, distances=changed)
+
+    assert written == 1
+    assert _npy_inode(matrix_path) == inode
+    # The open mapping sees the in-place write even before refresh()
+    assert cm.lookup('Mumbai', 'Hamburg', 'sea')['distance_km'] == 9000
+    assert cm.lookup('Shanghai', 'Rotterdam', 'sea')['distance_km'] == 20000
+
+
+def test_added_port_is_picked_up_by_open_matrix(matrix_path):
+    cm = matrix.CostMatrix(matrix_path)
+    positions = dict(cm.port_index)
+    ports = len(positions)
+
+    added = dict(DISTANCES)
+    added[('Tokyo', 'Boston')] = {'sea': 19000}
+    written = matrix.build_matrix(matrix_path, distances=added)
+
+    # Every pair touching the two new ports
+    total = ports + 2
+    assert written == total * total - ports * ports
+    assert cm.lookup('Tokyo', 'Boston', 'sea')['distance_km'] == 19000
+    # Existing ports keep their slots, so other processes' mappings stay valid
+    assert {p: cm.port_index[p] for p in positions} == positions
+
+
+def test_factor_change_forces_full_rebuild_and_refresh(matrix_path, restore_factors):
+    cm = matrix.CostMatrix(matrix_path)
+    inode = _npy_inode(matrix_path)
+    assert not cm.refresh()
+
+    tools.EMISSION_FACTORS['sea'] = 0.02
+    written = matrix.build_matrix(matrix_path, distances=DISTANCES)
+
+    assert written == len(cm.port_index) ** 2
+    assert _npy_inode(matrix_path) != inode
+    # The old mapping still reads the replaced file until refreshed
+    assert cm.lookup('Shanghai', 'Rotterdam', 'sea')['emission_factor'] == 0.015
+    assert cm.refresh()
+    assert cm.lookup('Shanghai', 'Rotterdam', 'sea')['emission_factor'] == 0.02
+    assert np.isclose(
+        cm.calculate_carbon('Shanghai', 'Rotterdam', 100.0, 'sea')['emissions_tonnes'],
+        LogisticsTools.calculate_carbon('Shanghai', 'Rotterdam', 100.0, 'sea')['emissions_tonnes']
+    )
@@ -0,0 +1,46 @@
+import pytest
+
+from model_router import CLEAR_MARGIN, CLOSE_MARGIN, choose_tier, score_spread
+
+
+def _decision(best, runner_up, third=10.0):
+    return {'all_scores': {'sea': runner_up, 'sea_slow': third, 'rail': best}}
+
+
+def _port(level):
+    return {'congestion_level': level}
+
+
+def test_score_spread_is_relative_gap_to_runner_up():
+    assert score_spread(_decision(0.4, 0.5)) == 0.25
+    assert score_spread({'all_scores': {'sea': 1.0}}) == float('inf')
+    # Non-positive best score has no meaningful relative gap
+    assert score_spread(_decision(0.0, 0.5)) == float('inf')
+
+
+@pytest.mark.parametrize('spread, congestion, tier', [
+    (CLEAR_MARGIN, 6, 'template'),          # clear margin, average congestion exactly at the template limit
+    (CLEAR_MARGIN, 6.5, 'fast'),            # just over the template congestion limit
+    (CLEAR_MARGIN - 0.01, 2, 'fast'),       # below the clear margin
+    (CLOSE_MARGIN, 2, 'fast'),              # close margin itself is not a close call
+    (CLOSE_MARGIN - 0.01, 2, 'full'),       # close call
+    (CLEAR_MARGIN, 7, 'fast'),              # average congestion 7 does not escalate...
+    (CLEAR_MARGIN, 7.5, 'full'),            # ...anything above it does
+    (1.0, 9, 'full'),
+])
+def test_choose_tier_boundaries(spread, congestion, tier):
+    decision = _decision(1.0, 1.0 + spread)
+
+    assert choose_tier(decision, _port(congestion), _port(congestion)) == (tier, round(spread, 4))
+
+
+def test_zero_best_score_is_treated_as_clear_cut():
+    assert choose_tier(_decision(0.0, 0.5), _port(3), _port(3)) == ('template', float('inf'))
+    assert choose_tier(_decision(0.0, 0.5), _port(8), _port(8))[0] == 'full'
+
+
+def test_average_congestion_uses_both_ports():
+    # 4 and 8 average to 6: still template; 5 and 8 average to 6.5: fast
+    decision = _decision(1.0, 1.0 + CLEAR_MARGIN)
+    assert choose_tier(decision, _port(4), _port(8))[0] == 'template'
+    assert choose_tier(decision, _port(5), _port(8))[0] == 'fast'
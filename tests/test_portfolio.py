@@ -0,0 +1,104 @@
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+from portfolio import PORTFOLIO_MODES, _lane_options, optimize_portfolio
+from tools import DISTANCES
+
+LANES = list(DISTANCES)
+
+
+def _brute_force(shipments, cap, tax):
+    """Cheapest on-time assignment under the cap by trying every combination (None if infeasible)."""
+    emissions, cost, transit = _lane_options([(s['origin'], s['destination']) for s in shipments], tax)
+    allowed = []
+    for i, s in enumerate(shipments):
+        on_time = [m for m in range(len(PORTFOLIO_MODES)) if transit[i, m] <= s.get('deadline_days', np.inf)]
+        allowed.append(on_time or [int(np.argmin(transit[i]))])
+
+    best = None
+    for combo in itertools.product(*allowed):
+        total_e = sum(emissions[i, m] * s['weight'] for i, (s, m) in enumerate(zip(shipments, combo)))
+        total_c = sum(cost[i, m] * s['weight'] for i, (s, m) in enumerate(zip(shipments, combo)))
+        if total_e <= cap + 1e-6 and (best is None or total_c < best):
+            best = total_c
+    return best
+
+
+def test_matches_brute_force_on_small_portfolios():
+    rng = random.Random(7)
+    for _ in range(100):
+        shipments = []
+        for _ in range(rng.randint(1, 5)):
+            origin, destination = rng.choice(LANES)
+            shipment = {'origin': origin, 'destination': destination, 'weight': rng.choice((10, 50, 100, 300, 800))}
+            if rng.random() < 0.4:
+                shipment['deadline_days'] = rng.choice((20, 30, 40, 60, 90))
+            shipments.append(shipment)
+        tax = rng.choice((50, 100, 140))
+        floor = optimize_portfolio(shipments, 0, tax)['total_emissions_tonnes']
+        ceiling = optimize_portfolio(shipments, float('inf'), tax)['baseline_emissions_tonnes']
+        cap = rng.uniform(floor * 0.95, ceiling)
+
+        result = optimize_portfolio(shipments, cap, tax)
+        best = _brute_force(shipments, cap, tax)
+
+        if best is None:
+            assert not result['cap_met']
+        else:
+            assert result['cap_met']
+            assert result['total_cost_usd'] <= best * 1.05 + 0.01
+
+
+def test_cap_already_met_keeps_cheapest_modes():
+    shipments = [{'origin': 'Shanghai', 'destination': 'Rotterdam', 'weight': 100}] * 3
+
+    result = optimize_portfolio(shipments, 1e9)
+
+    assert result['cap_met']
+    assert result['total_cost_usd'] == result['baseline_cost_usd']
+    assert result['shadow_price_usd_per_tonne'] == 0.0
+
+
+def test_infeasible_cap_goes_as_green_as_possible():
+    shipments = [
+        {'origin': 'Shanghai', 'destination': 'Rotterdam', 'weight': 100},
+        {'origin': 'Mumbai', 'destination': 'Hamburg', 'weight': 200}
+    ]
+    emissions, _, _ = _lane_options([(s['origin'], s['destination']) for s in shipments])
+    greenest = sum(emissions[i].min() * s['weight'] for i, s in enumerate(shipments))
+
+    result = optimize_portfolio(shipments, 0)
+
+    assert not result['cap_met']
+    assert result['total_emissions_tonnes'] == pytest.approx(greenest, abs=0.01)
+
+
+def test_every_mode_late_takes_fastest():
+    shipments = [{'origin': 'Shanghai', 'destination': 'Rotterdam', 'weight': 100, 'deadline_days': 1}]
+    _, _, transit = _lane_options([('Shanghai', 'Rotterdam')])
+
+    result = optimize_portfolio(shipments, 0)
+
+    assert result['late_shipments'] == 1
+    assert result['assigned_modes'] == [PORTFOLIO_MODES[int(np.argmin(transit[0]))]]
+
+
+def test_carbon_tax_is_passed_through():
+    shipments = [{'origin': 'Singapore', 'destination': 'London', 'weight': 100}]
+
+    low = optimize_portfolio(shipments, 1e9, carbon_tax_rate=0)
+    high = optimize_portfolio(shipments, 1e9, carbon_tax_rate=200)
+
+    assert high['baseline_cost_usd'] > low['baseline_cost_usd']
+    assert high['carbon_tax_rate'] == 200
+
+
+def test_empty_portfolio():
+    result = optimize_portfolio([], 10)
+
+    assert result['assigned_modes'] == []
+    assert result['total_cost_usd'] == 0.0
+    assert result['cap_met']
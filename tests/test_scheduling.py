@@ -0,0 +1,53 @@
+from datetime import date
+
+import numpy as np
+
+from scheduling import best_departures, departure_table, earliest_arrival_labels
+from tools import LogisticsTools
+
+LANE = ('Shanghai', 'Rotterdam')
+START = date(2026, 1, 5)
+
+
+def test_earliest_arrival_labels_waits_for_faster_later_departure():
+    # Day 2 and day 3 tie at 9; day 4 departs later but arrives last
+    arrival = np.array([10.0, 12.0, 9.0, 9.0, 15.0])
+
+    labels, departure = earliest_arrival_labels(arrival)
+
+    assert labels.tolist() == [9.0, 9.0, 9.0, 9.0, 15.0]
+    # Ties go to the earliest departure still available on the ready day
+    assert departure.tolist() == [2, 2, 2, 3, 4]
+
+
+def test_earliest_arrival_labels_per_row():
+    arrival = np.array([
+        [5.0, 4.0, 4.0, 8.0],
+        [3.0, 7.0, 6.0, 6.0]
+    ])
+
+    labels, departure = earliest_arrival_labels(arrival)
+
+    assert labels.tolist() == [[4.0, 4.0, 4.0, 8.0], [3.0, 6.0, 6.0, 6.0]]
+    assert departure.tolist() == [[1, 1, 2, 3], [0, 2, 2, 3]]
+
+
+def test_departure_cost_follows_carbon_tax():
+    base = departure_table([LANE], 100, start_date=START)
+    shocked = departure_table([LANE], 100, start_date=START, carbon_tax_rate=140)
+
+    # Same schedule, costs differ by exactly the extra tax on each mode's emissions
+    assert np.array_equal(base['arrival_day'], shocked['arrival_day'])
+    extra_tax = [LogisticsTools.calculate_carbon(*LANE, 100, mode)['emissions_tonnes'] * 40 for mode in base['modes']]
+    assert np.allclose(shocked['cost_usd'] - base['cost_usd'], np.array(extra_tax)[None, :, None], atol=0.02)
+
+
+def test_best_departures_deadline_and_empty_lanes():
+    assert best_departures([], 100) == []
+
+    results = best_departures([LANE], 100, deadline_days=1, start_date=START)
+    assert {r['mode'] for r in results} == {'sea', 'sea_slow', 'rail'}
+    assert all(r['cheapest_on_time_departure'] is None for r in results)
+
+    results = best_departures([LANE], 100, deadline_days=365, start_date=START, carbon_tax_rate=140)
+    assert all(r['cheapest_on_time_cost_usd'] is not None for r in results)
@@ -0,0 +1,19 @@
+import asyncio
+
+from tools import LogisticsTools
+
+
+def test_batch_accepts_optional_carbon_tax():
+    shipments = [('Shanghai', 'Rotterdam', 100.0), ('Shanghai', 'Rotterdam', 100.0, 140)]
+
+    default, shocked = LogisticsTools.compare_routes_batch(shipments)
+
+    assert default == LogisticsTools.compare_routes('Shanghai', 'Rotterdam', 100.0)
+    assert shocked == LogisticsTools.compare_routes('Shanghai', 'Rotterdam', 100.0, 140)
+
+
+def test_async_batch_matches_sync():
+    shipments = [('Mumbai', 'Hamburg', 50.0, 200), ('Dubai', 'Amsterdam', 10.0)]
+
+    assert asyncio.run(LogisticsTools.compare_routes_batch_async(shipments)) == \
+        LogisticsTools.compare_routes_batch(shipments)
@@ -1,4 +1,10 @@
+import asyncio
+import atexit
 import math
+import multiprocessing
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from crewai.tools import BaseTool
 from typing import Type
 from pydantic import BaseModel, Field
@@ -9,6 +15,7 @@ class RouteInput(BaseModel):
     destination: str = Field(..., description="Destination port/city")
     weight: float = Field(..., description="Cargo weight in metric tonnes")
     mode: str = Field(..., description="Transport mode: sea, sea_slow, rail, air, road")
+    carbon_tax_rate: float = Field(100, description="Carbon tax in USD per tonne CO2")
 
 class PortInput(BaseModel):
     port_name: str = Field(..., description="Name of the port")
@@ -17,6 +24,34 @@ class CompareInput(BaseModel):
     origin: str = Field(..., description="Origin location")
     destination: str = Field(..., description="Destination location")
     weight: float = Field(..., description="Cargo weight in tonnes")
+    carbon_tax_rate: float = Field(100, description="Carbon tax in USD per tonne CO2")
+
+# Shared executor for CPU-bound work offloaded from async tool calls
+_executor = None
+
+# Batch pricing is microseconds per shipment; a few workers keep up with any event loop
+MAX_BATCH_WORKERS = 4
+
+def shared_executor():
+    """
+    One process-wide worker pool for CPU-bound batches. With spare cores and forkserver
+    available (not on Windows), batches are priced in worker processes outside this
+    interpreter's GIL, leaving a core for the event loop; fork isn't used because the
+    app process runs threads. The forkserver preloads this module, so crewai is imported
+    once there rather than once per worker. On a single core, or without forkserver,
+    they stay on a thread pool. The pool is shut down at interpreter exit.
+    """
+    global _executor
+    if _executor is None:
+        cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+        if cores > 1 and 'forkserver' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('forkserver')
+            context.set_forkserver_preload([__name__])
+            _executor = ProcessPoolExecutor(max_workers=min(cores - 1, MAX_BATCH_WORKERS), mp_context=context)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=MAX_BATCH_WORKERS, thread_name_prefix="carbonix")
+        atexit.register(_executor.shutdown, wait=False, cancel_futures=True)
+    return _executor
 
 # Distance database (km)
 DISTANCES = {
@@ -58,7 +93,7 @@ class CarbonCalculatorTool(BaseTool):
     description: str = "Calculate carbon emissions, cost, and transit time for a shipment route"
     args_schema: Type[BaseModel] = RouteInput
 
-    def _run(self, origin: str, destination: str, weight: float, mode: str) -> dict:
+    def _run(self, origin: str, destination: str, weight: float, mode: str, carbon_tax_rate: float = 100) -> dict:
         route_key = (origin, destination)
         
         # Get distance
@@ -75,8 +110,8 @@ class CarbonCalculatorTool(BaseTool):
         cost_factor = COST_FACTORS.get(mode, 0.10)
         base_cost = distance * weight * cost_factor
         
-        # Calculate carbon tax ($100/tonne CO2)
-        carbon_tax = total_emissions * 100
+        # Calculate carbon tax (default $100/tonne CO2)
+        carbon_tax = total_emissions * carbon_tax_rate
         total_cost = base_cost + carbon_tax
         
         # Calculate transit time
@@ -93,6 +128,10 @@ class CarbonCalculatorTool(BaseTool):
             'transit_days': round(transit_days, 1)
         }
 
+    async def _arun(self, origin: str, destination: str, weight: float, mode: str, carbon_tax_rate: float = 100) -> dict:
+        # A handful of table lookups - cheaper inline than any executor hop
+        return self._run(origin, destination, weight, mode, carbon_tax_rate)
+
 class PortCongestionTool(BaseTool):
     name: str = "Port Congestion Checker"
     description: str = "Get congestion and delay information for a port"
@@ -100,9 +139,10 @@ class PortCongestionTool(BaseTool):
 
     def _run(self, port_name: str) -> dict:
         import random
-        random.seed(hash(port_name) % 100)
+        # crc32 rather than hash() so levels are stable across processes
+        rng = random.Random(zlib.crc32(port_name.encode()) % 100)
         
-        congestion_level = random.randint(3, 9)
+        congestion_level = rng.randint(3, 9)
         delay_days = round(congestion_level * 0.5, 1)
         status = "Low" if congestion_level <= 4 else "Moderate" if congestion_level <= 7 else "High"
         
@@ -111,31 +151,38 @@ class PortCongestionTool(BaseTool):
             'congestion_level': congestion_level,
             'status': status,
             'estimated_delay_days': delay_days,
-            'berth_availability': f"{random.randint(40, 95)}%"
+            'berth_availability': f"{rng.randint(40, 95)}%"
         }
 
+    async def _arun(self, port_name: str) -> dict:
+        # Congestion is derived locally (no network or disk I/O), so it never blocks the loop
+        return self._run(port_name)
+
 class RouteCompareTool(BaseTool):
     name: str = "Route Comparer"
     description: str = "Compare multiple transport modes for a route"
     args_schema: Type[BaseModel] = CompareInput
 
-    def _run(self, origin: str, destination: str, weight: float) -> list:
+    def _run(self, origin: str, destination: str, weight: float, carbon_tax_rate: float = 100) -> list:
         modes = ['sea', 'sea_slow', 'rail']
         results = []
         calc_tool = CarbonCalculatorTool()
         
         for mode in modes:
-            result = calc_tool._run(origin, destination, weight, mode)
+            result = calc_tool._run(origin, destination, weight, mode, carbon_tax_rate)
             results.append(result)
         
         return results
 
+    async def _arun(self, origin: str, destination: str, weight: float, carbon_tax_rate: float = 100) -> list:
+        return self._run(origin, destination, weight, carbon_tax_rate)
+
 # Helper functions for dashboard (non-tool usage)
 class LogisticsTools:
     @staticmethod
-    def calculate_carbon(origin: str, destination: str, weight: float, mode: str) -> dict:
+    def calculate_carbon(origin: str, destination: str, weight: float, mode: str, carbon_tax_rate: float = 100) -> dict:
         tool = CarbonCalculatorTool()
-        return tool._run(origin, destination, weight, mode)
+        return tool._run(origin, destination, weight, mode, carbon_tax_rate)
     
     @staticmethod
     def get_port_congestion(port_name: str) -> dict:
@@ -143,6 +190,22 @@ class LogisticsTools:
         return tool._run(port_name)
     
     @staticmethod
-    def compare_routes(origin: str, destination: str, weight: float) -> list:
+    def compare_routes(origin: str, destination: str, weight: float, carbon_tax_rate: float = 100) -> list:
+        tool = RouteCompareTool()
+        return tool._run(origin, destination, weight, carbon_tax_rate)
+    
+    @staticmethod
+    def compare_routes_batch(shipments: list) -> list:
+        """Route comparison for many (origin, destination, weight[, carbon_tax_rate]) shipments."""
         tool = RouteCompareTool()
-        return tool._run(origin, destination, weight)
\ No newline at end of file
+        return [tool._run(*shipment) for shipment in shipments]
+    
+    @staticmethod
+    async def compare_routes_batch_async(shipments: list) -> list:
+        """
+        Batch pricing is CPU-bound, so it runs in the shared worker pool instead of the event loop.
+        For async callers pricing many shipments at once; no agent or tool path uses it yet
+        (bench_async.py exercises it), and batch.py workers price synchronously.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(shared_executor(), LogisticsTools.compare_routes_batch, shipments)
\ No newline at end of file